@@ -1,7 +1,8 @@
 import discord
 from discord import app_commands
-import json, random, string, threading, os, logging
-from datetime import datetime, timedelta
+import secrets, string, threading, os, logging, atexit, time, io, heapq, asyncio, bisect, re
+from collections import deque, OrderedDict
+from datetime import timedelta
 
 # =========================
 # LOGGING
@@ -18,606 +19,448 @@ log = logging.getLogger(__name__)
 BOT_TOKEN    = os.environ.get("BOT_TOKEN")
 ADMIN_ROLE_ID = int(os.environ.get("ADMIN_ROLE_ID", 0))
 GUILD_ID      = os.environ.get("GUILD_ID")          # ← ADICIONE no Railway para sync instantâneo
-
-if not BOT_TOKEN:
+MAX_BATCH     = int(os.environ.get("MAX_BATCH", 500))   # máx. de keys por /keys/validate/batch
+MAX_BULK      = int(os.environ.get("MAX_BULK", 1000))   # máx. de keys por /createkeys e bulk-create
+LOG_CHANNEL_ID = int(os.environ.get("LOG_CHANNEL_ID", 0)) # canal para resumos de expiração (0 = desligado)
+EXPIRY_BATCH  = int(os.environ.get("EXPIRY_BATCH", 500))  # keys removidas por lote pelo scheduler
+KEY_POOL_SIZE = int(os.environ.get("KEY_POOL_SIZE", 0))  # keys pré-geradas em background (0 = desligado)
+PAGE_SIZE     = int(os.environ.get("PAGE_SIZE", 100))   # linhas por página nos dashboards
+RESPONSE_CACHE_MB = int(os.environ.get("RESPONSE_CACHE_MB", 64))  # teto (corpo + gzip) das respostas públicas em cache
+RUN_BOT       = os.environ.get("RUN_BOT", "1") != "0"    # 0 = réplica só web (exige STORAGE=redis)
+RATE_LIMIT    = float(os.environ.get("RATE_LIMIT", 0))   # req/s por IP e rota nas rotas públicas (0 = desligado; ligar junto com TRUSTED_PROXIES)
+RATE_BURST    = int(os.environ.get("RATE_BURST", 30))    # rajada permitida acima da taxa
+RATE_CLIENTS  = int(os.environ.get("RATE_CLIENTS", 100000))      # buckets (IP, rota) mantidos em memória
+TRUSTED_PROXIES = int(os.environ.get("TRUSTED_PROXIES", 0))      # proxies na frente (X-Forwarded-For confiável; Railway = 1)
+NEGATIVE_CACHE_SIZE = int(os.environ.get("NEGATIVE_CACHE_SIZE", 50000))  # keys recusadas lembradas
+
+# Servidor web: "waitress" (produção, multi-thread) ou "dev" (Werkzeug).
+# Workers são threads no mesmo processo do bot: o KeyStore é em memória.
+WEB_SERVER      = os.environ.get("WEB_SERVER", "waitress").lower()
+WEB_THREADS     = int(os.environ.get("WEB_THREADS", 8))
+WEB_BACKLOG     = int(os.environ.get("WEB_BACKLOG", 1024))
+WEB_KEEPALIVE   = int(os.environ.get("WEB_KEEPALIVE", 30))     # segundos até fechar conexão ociosa
+WEB_CONNECTIONS = int(os.environ.get("WEB_CONNECTIONS", 1000))
+MAX_PAGE_SIZE = 1000
+MAX_DURATION  = timedelta(days=100 * 365)   # teto de validade aceito por parse_duration
+
+if RUN_BOT and not BOT_TOKEN:
     raise RuntimeError("BOT_TOKEN não encontrado nas variáveis de ambiente!")
 
 # =========================
-# DATABASE (JSON)
+# DATABASE (JSON ou SQLite, via STORAGE — ver storage.py)
 # Nota: no Railway o filesystem é efêmero.
 # Para persistência real, use Railway + PostgreSQL ou Redis.
 # =========================
-DB_FILE = "/tmp/keys.json"   # /tmp sobrevive ao processo mas não ao redeploy
+from keystore import KeyStore, KeyRecord
+from metrics import REGISTRY, Counter, Gauge, Histogram, timed
+from feed import RevocationFeed, FEED_PORT
+from tokens import open_signer
 
-def load_keys() -> dict:
-    try:
-        with open(DB_FILE, "r") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {}
+store = KeyStore()              # único por processo: Flask e bot leem/escrevem aqui
+atexit.register(store.close)    # garante o último flush ao encerrar
+token_signer = open_signer()    # None = tokens assinados desligados (TOKEN_KEY vazio)
 
-def save_keys(keys: dict):
-    with open(DB_FILE, "w") as f:
-        json.dump(keys, f, indent=4)
+KEY_ALPHABET = string.ascii_uppercase + string.digits
 
 def generate_key() -> str:
     def part():
-        return ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
+        return ''.join(secrets.choice(KEY_ALPHABET) for _ in range(4))
     return f"WHITE-{part()}-{part()}-{part()}"
 
-def clean_expired() -> dict:
-    keys = load_keys()
-    now  = datetime.utcnow()
-    valid = {k: v for k, v in keys.items()
-             if datetime.fromisoformat(v["expires"]) > now}
-    save_keys(valid)
-    return valid
+KEY_RE = re.compile(rf"WHITE(-[{KEY_ALPHABET}]{{4}}){{3}}")
+
+class KeyPool:
+    """Keys pré-geradas (ainda inexistentes no store), reabastecidas por uma thread."""
+
+    def __init__(self, size: int):
+        self.size  = size
+        self._keys = deque()                # append/popleft são thread-safe
+        self._low  = threading.Event()
+        self._low.set()
+        threading.Thread(target=self._fill, name="key-pool", daemon=True).start()
+
+    def _fill(self):
+        while True:
+            self._low.wait()
+            self._low.clear()
+            while len(self._keys) < self.size:
+                k = generate_key()
+                if k not in store:
+                    self._keys.append(k)
+
+    def take(self) -> str | None:
+        try:
+            k = self._keys.popleft()
+        except IndexError:
+            k = None
+        if len(self._keys) < self.size // 2:
+            self._low.set()
+        return k
+
+key_pool = KeyPool(KEY_POOL_SIZE) if KEY_POOL_SIZE > 0 else None
+
+def new_key() -> str:
+    """Key que não existe no store (do pool se houver; senão gerada na hora)."""
+    k = key_pool.take() if key_pool else None
+    while k is None or k in store:
+        k = generate_key()
+    return k
+
+def create_keys(count: int, delta: timedelta, created_by) -> tuple[list[str], int]:
+    """Gera `count` keys inéditas e grava todas num único lote do store.
+
+    Retorna as keys e a expiração gravada (epoch UTC, a mesma de /keys/validate).
+    """
+    epoch   = int(time.time())
+    rec     = KeyRecord(epoch + int(delta.total_seconds()), epoch, created_by)
+    created = []
+    while len(created) < count:
+        batch = {}
+        while len(batch) < count - len(created):
+            batch[new_key()] = rec
+        created += store.add_many(batch)    # add_many descarta colisões de última hora
+    return created, rec.expires
+
+def keys_file(keys: list[str], expires: int) -> bytes:
+    """Uma key por linha; com tokens ligados, "KEY TOKEN" (mesmo token da /createkey).
+
+    `expires` é o que create_keys gravou: a key pode já ter sido removida do store.
+    """
+    if token_signer is not None:
+        keys = [f"{k} {token_signer.sign(k, expires)}" for k in keys]
+    return ("\n".join(keys) + "\n").encode()
+
+class NegativeCache:
+    """LRU limitado de keys recusadas ("unknown") recentemente.
+
+    Chutes repetidos respondem daqui; uma key criada (aqui ou em outra
+    réplica) sai do cache pelo listener do store.
+    """
+
+    def __init__(self, size: int):
+        self.size  = size
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+        store.subscribe(self._on_change)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            if key not in self._keys:
+                return False
+            self._keys.move_to_end(key)
+            return True
+
+    def add(self, key: str):
+        with self._lock:
+            self._keys[key] = None
+            self._keys.move_to_end(key)
+            if len(self._keys) > self.size:
+                self._keys.popitem(last=False)
+        if key in store:                # criada entre a consulta e o add: o listener já passou
+            self.discard(key)
+
+    def discard(self, key: str):
+        with self._lock:
+            self._keys.pop(key, None)
+
+    def _on_change(self, version, op, key):
+        if op == "add":
+            self.discard(key)
+
+negative_cache = NegativeCache(NEGATIVE_CACHE_SIZE)
+NEGATIVE_HITS  = Counter("negative_cache_hits_total", "Keys recusadas respondidas pelo cache negativo")
+
+class KeyIndex:
+    """Lista ordenada das keys do store para busca por prefixo (autocomplete).
+
+    O listener do store só anota as mudanças (O(1) sob o lock do store); a
+    próxima busca aplica o lote — bisect para poucas, merge O(n) para lotes
+    grandes como /createkeys ou a expiração. Cada busca é O(log n + resultados).
+    """
+
+    MERGE_AT = 64           # a partir daqui o lote é aplicado com merge em vez de insort
+
+    def __init__(self):
+        self._keys    = []
+        self._pending = {}                  # key -> True (criada) | False (removida)
+        self._lock    = threading.Lock()
+        store.subscribe(self._on_change)    # antes do snapshot: o que mudar no meio fica em _pending
+        self._keys = sorted(store.snapshot())
+
+    def _on_change(self, version, op, key):
+        if op != "upd":
+            with self._lock:
+                self._pending[key] = op == "add"
+
+    def _apply(self):
+        pending, self._pending = self._pending, {}
+        keys = self._keys
+        gone = [k for k, added in pending.items() if not added]
+        new  = sorted(k for k, added in pending.items() if added)
+        if len(gone) >= self.MERGE_AT:
+            gone = set(gone)
+            keys = [k for k in keys if k not in gone]
+        else:
+            for k in gone:
+                i = bisect.bisect_left(keys, k)
+                if i < len(keys) and keys[i] == k:
+                    del keys[i]
+        new = [k for k in new if not self._has(keys, k)]
+        if len(new) >= self.MERGE_AT:
+            keys = list(heapq.merge(keys, new))
+        else:
+            for k in new:
+                bisect.insort(keys, k)
+        self._keys = keys
+
+    @staticmethod
+    def _has(keys: list, key: str) -> bool:
+        i = bisect.bisect_left(keys, key)
+        return i < len(keys) and keys[i] == key
+
+    def search(self, prefix: str, limit: int = 25) -> list[str]:
+        """Até `limit` keys começando com `prefix` (com ou sem "WHITE-")."""
+        prefix = prefix.strip().upper()
+        out = []
+        with self._lock:
+            if self._pending:
+                self._apply()
+            keys = self._keys
+            for p in (prefix,) if prefix.startswith("WHITE-") or not prefix else (prefix, "WHITE-" + prefix):
+                i = bisect.bisect_left(keys, p)
+                while i < len(keys) and len(out) < limit and keys[i].startswith(p):
+                    out.append(keys[i])
+                    i += 1
+        return out
+
+key_index = KeyIndex()
+
+def lookup_key(key: str, now: float | None = None) -> tuple[str, KeyRecord | None, int | None]:
+    """Consulta O(1) de uma key: ("valid" | "expired" | "unknown", registro, epoch)."""
+    key = key.strip().upper()
+    if not KEY_RE.fullmatch(key):   # lixo não vai para o cache negativo nem para o store
+        return "unknown", None, None
+    if key in negative_cache:
+        NEGATIVE_HITS.inc()
+        return "unknown", None, None
+    rec = store.get(key)
+    if rec is None:
+        negative_cache.add(key)
+        return "unknown", None, None
+    if rec.expires <= (time.time() if now is None else now):
+        return "expired", rec, rec.expires
+    return "valid", rec, rec.expires
+
+SORT_FIELDS = {
+    "key":     lambda row: row[0],
+    "expires": lambda row: row[1].expires,
+    "created": lambda row: row[1].created_at or 0,
+}
+
+def query_keys(q: str = "", status: str = "all", within_days: int | None = None,
+               sort: str = "", limit: int = PAGE_SIZE, offset: int = 0) -> tuple[list, int]:
+    """Filtra/ordena/pagina as keys em memória; retorna (página de (key, registro), total filtrado).
+
+    q é prefixo da key (com ou sem "WHITE-"), status é all|active|used,
+    within_days limita às que expiram nos próximos N dias e sort aceita
+    key|expires|created, com "-" na frente para ordem decrescente.
+    """
+    rows = store.items()
+    q = q.strip().upper()
+    if q:
+        alt  = "WHITE-" + q
+        rows = [r for r in rows if r[0].startswith(q) or r[0].startswith(alt)]
+    if status == "used":
+        rows = [r for r in rows if r[1].used]
+    elif status == "active":
+        rows = [r for r in rows if not r[1].used]
+    if within_days is not None:
+        limit_ts = time.time() + within_days * 86400
+        rows = [r for r in rows if r[1].expires <= limit_ts]
+    total = len(rows)
+    field = SORT_FIELDS.get(sort.lstrip("-"))
+    if field:
+        pick = heapq.nlargest if sort.startswith("-") else heapq.nsmallest
+        rows = pick(offset + limit, rows, key=field)    # só ordena o necessário até a página
+    return rows[offset:offset + limit], total
 
 def parse_duration(d: str) -> timedelta | None:
     d = d.lower().strip()
+    delta = None
     try:
-        if d.endswith("d"):  return timedelta(days=int(d[:-1]))
-        if d.endswith("m"):  return timedelta(days=int(d[:-1]) * 30)
-        if d.endswith("a"):  return timedelta(days=int(d[:-1]) * 365)
-        if d.endswith("h"):  return timedelta(hours=int(d[:-1]))
-    except ValueError:
-        pass
-    return None
+        if d.endswith("d"):    delta = timedelta(days=int(d[:-1]))
+        elif d.endswith("m"):  delta = timedelta(days=int(d[:-1]) * 30)
+        elif d.endswith("a"):  delta = timedelta(days=int(d[:-1]) * 365)
+        elif d.endswith("h"):  delta = timedelta(hours=int(d[:-1]))
+    except (ValueError, OverflowError):
+        return None
+    # sem teto, "99999a" estoura datetime depois de a key já ter sido criada
+    if delta is None or not timedelta(0) < delta <= MAX_DURATION:
+        return None
+    return delta
 
 # =========================
 # FLASK DASHBOARD
+# Templates em template/ (compilados uma vez e cacheados pelo Jinja);
+# CSS/JS em static/, servidos da memória com gzip e cache longo.
 # =========================
 ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "white2024")
+BASE_DIR       = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR     = os.path.join(BASE_DIR, "static")
 
-PUBLIC_HTML = """<!DOCTYPE html>
-<html lang="pt-BR">
-<head>
-<meta charset="UTF-8">
-<meta name="viewport" content="width=device-width,initial-scale=1">
-<title>White External</title>
-<link href="https://fonts.googleapis.com/css2?family=Share+Tech+Mono&family=Rajdhani:wght@400;500;600;700&display=swap" rel="stylesheet">
-<style>
-:root{
-  --bg:#080b0f;--surface:#0d1117;--border:#1a2332;--border-glow:#e63946;
-  --red:#e63946;--red-dim:#7f1d1d;--green:#22c55e;--green-dim:#14532d;
-  --text:#c9d1d9;--text-dim:#8b949e;--mono:'Share Tech Mono',monospace;
-  --sans:'Rajdhani',sans-serif;
-}
-*{box-sizing:border-box;margin:0;padding:0}
-body{background:var(--bg);color:var(--text);font-family:var(--sans);min-height:100vh;
-  overflow-x:hidden}
-
-/* scanline overlay */
-body::before{content:'';position:fixed;inset:0;pointer-events:none;z-index:999;
-  background:repeating-linear-gradient(0deg,transparent,transparent 2px,rgba(0,0,0,.08) 2px,rgba(0,0,0,.08) 4px)}
-
-.wrap{max-width:960px;margin:0 auto;padding:2.5rem 1.5rem}
-
-/* ── HEADER ── */
-header{display:flex;align-items:center;justify-content:space-between;
-  padding-bottom:2rem;border-bottom:1px solid var(--border);margin-bottom:2.5rem}
-.logo{display:flex;align-items:center;gap:.75rem}
-.logo-icon{width:38px;height:38px;border:2px solid var(--red);border-radius:6px;
-  display:grid;place-items:center;font-size:1.1rem;color:var(--red);
-  box-shadow:0 0 12px #e6394430;animation:pulse 3s ease-in-out infinite}
-@keyframes pulse{0%,100%{box-shadow:0 0 12px #e6394430}50%{box-shadow:0 0 22px #e6394460}}
-.logo-text{font-size:1.5rem;font-weight:700;letter-spacing:.06em;color:#f1f5f9}
-.logo-text span{color:var(--red)}
-.version{font-family:var(--mono);font-size:.7rem;color:var(--text-dim);
-  background:#0d1117;border:1px solid var(--border);padding:3px 10px;border-radius:4px}
-.admin-btn{font-family:var(--sans);font-size:.85rem;font-weight:600;
-  color:var(--text-dim);background:transparent;border:1px solid var(--border);
-  padding:6px 16px;border-radius:6px;cursor:pointer;text-decoration:none;
-  transition:all .2s;letter-spacing:.04em}
-.admin-btn:hover{color:var(--red);border-color:var(--red);background:#e6394410}
-
-/* ── STATS ── */
-.stats{display:grid;grid-template-columns:repeat(auto-fit,minmax(180px,1fr));gap:1rem;margin-bottom:2.5rem}
-.stat{background:var(--surface);border:1px solid var(--border);border-radius:10px;
-  padding:1.25rem 1.5rem;position:relative;overflow:hidden;transition:border-color .2s}
-.stat:hover{border-color:#1e3a5f}
-.stat::before{content:'';position:absolute;top:0;left:0;right:0;height:2px;
-  background:linear-gradient(90deg,transparent,var(--red),transparent);opacity:.6}
-.stat-num{font-family:var(--mono);font-size:2.2rem;font-weight:400;
-  color:var(--red);line-height:1;margin-bottom:.35rem}
-.stat-lbl{font-size:.75rem;font-weight:600;text-transform:uppercase;
-  letter-spacing:.1em;color:var(--text-dim)}
-
-/* ── TABLE ── */
-.table-wrap{background:var(--surface);border:1px solid var(--border);border-radius:12px;overflow:hidden}
-.table-header{display:flex;align-items:center;justify-content:space-between;
-  padding:1rem 1.5rem;border-bottom:1px solid var(--border)}
-.table-title{font-size:1rem;font-weight:700;letter-spacing:.05em;
-  text-transform:uppercase;color:var(--text-dim)}
-.dot{width:8px;height:8px;border-radius:50%;background:var(--green);
-  box-shadow:0 0 8px var(--green);display:inline-block;margin-right:.5rem;
-  animation:blink 2s ease-in-out infinite}
-@keyframes blink{0%,100%{opacity:1}50%{opacity:.3}}
-table{width:100%;border-collapse:collapse}
-th{padding:.75rem 1.5rem;text-align:left;font-size:.72rem;font-weight:700;
-  text-transform:uppercase;letter-spacing:.09em;color:var(--text-dim);
-  background:#0a0e14;border-bottom:1px solid var(--border)}
-tbody tr{border-bottom:1px solid #0d1117;transition:background .15s}
-tbody tr:hover{background:#0d1520}
-td{padding:.85rem 1.5rem;font-size:.9rem;vertical-align:middle}
-.key-mono{font-family:var(--mono);font-size:.82rem;color:#7dd3fc;letter-spacing:.03em}
-.date-col{font-family:var(--mono);font-size:.8rem;color:var(--text-dim)}
-.badge{display:inline-flex;align-items:center;gap:5px;padding:3px 11px;
-  border-radius:20px;font-size:.72rem;font-weight:700;letter-spacing:.04em;text-transform:uppercase}
-.badge-active{background:#052e16;color:var(--green);border:1px solid #166534}
-.badge-used{background:#1c1207;color:#f59e0b;border:1px solid #92400e}
-.empty-state{text-align:center;padding:4rem 2rem;color:var(--text-dim)}
-.empty-state .e-icon{font-size:2.5rem;margin-bottom:1rem;opacity:.3}
-footer{text-align:center;margin-top:2.5rem;color:var(--text-dim);
-  font-family:var(--mono);font-size:.72rem;opacity:.5}
-</style>
-</head>
-<body>
-<div class="wrap">
-  <header>
-    <div class="logo">
-      <div class="logo-icon">W</div>
-      <div>
-        <div class="logo-text">White<span>External</span></div>
-      </div>
-    </div>
-    <div style="display:flex;align-items:center;gap:1rem">
-      <span class="version">v1.0</span>
-      <a href="/admin" class="admin-btn">Admin →</a>
-    </div>
-  </header>
-
-  <div class="stats">
-    <div class="stat">
-      <div class="stat-num">{{ total }}</div>
-      <div class="stat-lbl">Keys Ativas</div>
-    </div>
-    <div class="stat">
-      <div class="stat-num">{{ used_count }}</div>
-      <div class="stat-lbl">Já Utilizadas</div>
-    </div>
-    <div class="stat">
-      <div class="stat-num">{{ available }}</div>
-      <div class="stat-lbl">Disponíveis</div>
-    </div>
-  </div>
-
-  <div class="table-wrap">
-    <div class="table-header">
-      <span class="table-title"><span class="dot"></span>Keys em circulação</span>
-    </div>
-    {% if keys %}
-    <table>
-      <thead><tr>
-        <th>Key</th><th>Criada em</th><th>Expira em</th><th>Status</th>
-      </tr></thead>
-      <tbody>
-      {% for k,v in keys.items() %}
-      <tr>
-        <td class="key-mono">{{ k }}</td>
-        <td class="date-col">{{ v.get('created_at','—')[:10] }}</td>
-        <td class="date-col">{{ v['expires'][:10] }}</td>
-        <td>
-          {% if v.get('used') %}
-            <span class="badge badge-used">⬡ Utilizada</span>
-          {% else %}
-            <span class="badge badge-active">● Ativa</span>
-          {% endif %}
-        </td>
-      </tr>
-      {% endfor %}
-      </tbody>
-    </table>
-    {% else %}
-    <div class="empty-state">
-      <div class="e-icon">⬡</div>
-      <div>Nenhuma key ativa no momento.</div>
-    </div>
-    {% endif %}
-  </div>
-  <footer>WHITE EXTERNAL SYSTEMS // ACESSO RESTRITO</footer>
-</div>
-</body>
-</html>"""
-
-LOGIN_HTML = """<!DOCTYPE html>
-<html lang="pt-BR">
-<head>
-<meta charset="UTF-8">
-<meta name="viewport" content="width=device-width,initial-scale=1">
-<title>Admin — White External</title>
-<link href="https://fonts.googleapis.com/css2?family=Share+Tech+Mono&family=Rajdhani:wght@500;600;700&display=swap" rel="stylesheet">
-<style>
-:root{--bg:#080b0f;--surface:#0d1117;--border:#1a2332;--red:#e63946;
-  --text:#c9d1d9;--text-dim:#8b949e;--mono:'Share Tech Mono',monospace;--sans:'Rajdhani',sans-serif}
-*{box-sizing:border-box;margin:0;padding:0}
-body{background:var(--bg);color:var(--text);font-family:var(--sans);
-  min-height:100vh;display:grid;place-items:center}
-body::before{content:'';position:fixed;inset:0;pointer-events:none;
-  background:repeating-linear-gradient(0deg,transparent,transparent 2px,rgba(0,0,0,.07) 2px,rgba(0,0,0,.07) 4px)}
-.box{background:var(--surface);border:1px solid var(--border);border-radius:14px;
-  padding:2.5rem;width:100%;max-width:380px;position:relative;overflow:hidden}
-.box::before{content:'';position:absolute;top:0;left:0;right:0;height:2px;
-  background:linear-gradient(90deg,transparent,var(--red),transparent)}
-.icon{width:48px;height:48px;border:2px solid var(--red);border-radius:8px;
-  display:grid;place-items:center;font-size:1.4rem;color:var(--red);
-  margin:0 auto 1.5rem;box-shadow:0 0 20px #e6394430}
-h2{text-align:center;font-size:1.3rem;font-weight:700;letter-spacing:.06em;
-  margin-bottom:.4rem}
-.sub{text-align:center;font-family:var(--mono);font-size:.72rem;
-  color:var(--text-dim);margin-bottom:2rem}
-label{display:block;font-size:.75rem;font-weight:700;text-transform:uppercase;
-  letter-spacing:.08em;color:var(--text-dim);margin-bottom:.5rem}
-input{width:100%;background:#080b0f;border:1px solid var(--border);border-radius:7px;
-  padding:.75rem 1rem;font-family:var(--mono);font-size:.9rem;color:var(--text);
-  outline:none;transition:border-color .2s}
-input:focus{border-color:var(--red)}
-.btn{width:100%;margin-top:1.5rem;padding:.8rem;background:var(--red);
-  border:none;border-radius:7px;color:#fff;font-family:var(--sans);
-  font-size:1rem;font-weight:700;letter-spacing:.06em;cursor:pointer;
-  transition:opacity .2s}
-.btn:hover{opacity:.85}
-.err{background:#7f1d1d30;border:1px solid #991b1b;border-radius:7px;
-  padding:.65rem 1rem;margin-bottom:1rem;font-size:.85rem;color:#fca5a5;text-align:center}
-.back{display:block;text-align:center;margin-top:1.2rem;font-family:var(--mono);
-  font-size:.72rem;color:var(--text-dim);text-decoration:none}
-.back:hover{color:var(--red)}
-</style>
-</head>
-<body>
-<div class="box">
-  <div class="icon">⬡</div>
-  <h2>PAINEL ADMIN</h2>
-  <p class="sub">White External // Acesso Restrito</p>
-  {% if error %}<div class="err">{{ error }}</div>{% endif %}
-  <form method="POST" action="/admin/login">
-    <label>Senha de Acesso</label>
-    <input type="password" name="password" placeholder="••••••••" autofocus>
-    <button class="btn" type="submit">ENTRAR</button>
-  </form>
-  <a class="back" href="/">← Voltar ao site</a>
-</div>
-</body>
-</html>"""
-
-ADMIN_HTML = """<!DOCTYPE html>
-<html lang="pt-BR">
-<head>
-<meta charset="UTF-8">
-<meta name="viewport" content="width=device-width,initial-scale=1">
-<title>Admin — White External</title>
-<link href="https://fonts.googleapis.com/css2?family=Share+Tech+Mono&family=Rajdhani:wght@400;500;600;700&display=swap" rel="stylesheet">
-<style>
-:root{
-  --bg:#080b0f;--surface:#0d1117;--surface2:#111827;--border:#1a2332;
-  --red:#e63946;--green:#22c55e;--yellow:#f59e0b;--blue:#38bdf8;
-  --text:#c9d1d9;--text-dim:#8b949e;
-  --mono:'Share Tech Mono',monospace;--sans:'Rajdhani',sans-serif
-}
-*{box-sizing:border-box;margin:0;padding:0}
-body{background:var(--bg);color:var(--text);font-family:var(--sans);min-height:100vh;overflow-x:hidden}
-body::before{content:'';position:fixed;inset:0;pointer-events:none;z-index:999;
-  background:repeating-linear-gradient(0deg,transparent,transparent 2px,rgba(0,0,0,.06) 2px,rgba(0,0,0,.06) 4px)}
-.wrap{max-width:1100px;margin:0 auto;padding:2rem 1.5rem}
-
-/* HEADER */
-header{display:flex;align-items:center;justify-content:space-between;
-  padding-bottom:1.75rem;border-bottom:1px solid var(--border);margin-bottom:2rem}
-.logo{display:flex;align-items:center;gap:.75rem}
-.logo-icon{width:36px;height:36px;border:2px solid var(--red);border-radius:6px;
-  display:grid;place-items:center;font-size:1rem;color:var(--red);
-  box-shadow:0 0 14px #e6394440;animation:glow 3s ease-in-out infinite}
-@keyframes glow{0%,100%{box-shadow:0 0 14px #e6394440}50%{box-shadow:0 0 24px #e6394470}}
-.logo-name{font-size:1.3rem;font-weight:700;letter-spacing:.05em}
-.logo-name span{color:var(--red)}
-.hdr-right{display:flex;align-items:center;gap:.75rem}
-.chip{font-family:var(--mono);font-size:.7rem;color:var(--text-dim);
-  background:var(--surface2);border:1px solid var(--border);padding:4px 12px;border-radius:20px}
-.logout{font-family:var(--sans);font-size:.82rem;font-weight:600;color:var(--red);
-  background:transparent;border:1px solid #991b1b;padding:5px 14px;border-radius:6px;
-  cursor:pointer;text-decoration:none;transition:all .2s;letter-spacing:.04em}
-.logout:hover{background:#e6394420}
-
-/* STATS */
-.stats{display:grid;grid-template-columns:repeat(auto-fit,minmax(160px,1fr));gap:1rem;margin-bottom:2rem}
-.stat{background:var(--surface);border:1px solid var(--border);border-radius:10px;
-  padding:1.2rem 1.4rem;position:relative;overflow:hidden;transition:transform .15s,border-color .2s}
-.stat:hover{transform:translateY(-1px);border-color:#1e3a5f}
-.stat-bar{position:absolute;top:0;left:0;right:0;height:2px}
-.red-bar{background:linear-gradient(90deg,transparent,var(--red),transparent)}
-.green-bar{background:linear-gradient(90deg,transparent,var(--green),transparent)}
-.yellow-bar{background:linear-gradient(90deg,transparent,var(--yellow),transparent)}
-.blue-bar{background:linear-gradient(90deg,transparent,var(--blue),transparent)}
-.stat-num{font-family:var(--mono);font-size:2rem;line-height:1;margin-bottom:.3rem}
-.c-red{color:var(--red)}.c-green{color:var(--green)}.c-yellow{color:var(--yellow)}.c-blue{color:var(--blue)}
-.stat-lbl{font-size:.73rem;font-weight:700;text-transform:uppercase;letter-spacing:.09em;color:var(--text-dim)}
-
-/* TOOLBAR */
-.toolbar{display:flex;align-items:center;justify-content:space-between;
-  flex-wrap:wrap;gap:.75rem;margin-bottom:1rem}
-.toolbar-left{display:flex;align-items:center;gap:.75rem}
-.section-title{font-size:1rem;font-weight:700;text-transform:uppercase;
-  letter-spacing:.07em;color:var(--text-dim)}
-.dot{width:8px;height:8px;border-radius:50%;background:var(--green);
-  box-shadow:0 0 6px var(--green);display:inline-block;margin-right:.4rem;
-  animation:blink 2s ease-in-out infinite}
-@keyframes blink{0%,100%{opacity:1}50%{opacity:.25}}
-.search{background:var(--surface2);border:1px solid var(--border);border-radius:7px;
-  padding:.5rem .9rem;font-family:var(--mono);font-size:.8rem;color:var(--text);
-  outline:none;width:220px;transition:border-color .2s}
-.search:focus{border-color:var(--red)}
-.filter-btn{font-family:var(--sans);font-size:.8rem;font-weight:600;padding:5px 14px;
-  border-radius:6px;cursor:pointer;border:1px solid var(--border);
-  background:transparent;color:var(--text-dim);transition:all .2s;letter-spacing:.04em}
-.filter-btn.active,.filter-btn:hover{border-color:var(--red);color:var(--red);background:#e6394415}
-
-/* TABLE */
-.tbl-wrap{background:var(--surface);border:1px solid var(--border);border-radius:12px;overflow:hidden}
-table{width:100%;border-collapse:collapse}
-th{padding:.7rem 1.2rem;text-align:left;font-size:.71rem;font-weight:700;
-  text-transform:uppercase;letter-spacing:.09em;color:var(--text-dim);
-  background:#0a0e14;border-bottom:1px solid var(--border);white-space:nowrap}
-tbody tr{border-bottom:1px solid #0b0f15;transition:background .12s;cursor:default}
-tbody tr:hover{background:#0d1520}
-tbody tr.row-used{opacity:.65}
-td{padding:.9rem 1.2rem;font-size:.88rem;vertical-align:middle}
-.key-mono{font-family:var(--mono);font-size:.8rem;color:var(--blue)}
-.date-mono{font-family:var(--mono);font-size:.78rem;color:var(--text-dim)}
-.creator{font-size:.82rem;color:var(--text-dim)}
-
-/* BADGES */
-.badge{display:inline-flex;align-items:center;gap:4px;padding:3px 10px;
-  border-radius:20px;font-size:.7rem;font-weight:700;letter-spacing:.04em;text-transform:uppercase;white-space:nowrap}
-.b-active{background:#052e16;color:var(--green);border:1px solid #166534}
-.b-used{background:#1c1207;color:var(--yellow);border:1px solid #92400e}
-
-/* ACTIONS */
-.actions{display:flex;align-items:center;gap:.5rem}
-.btn-icon{display:inline-flex;align-items:center;justify-content:center;
-  width:30px;height:30px;border-radius:6px;border:1px solid var(--border);
-  background:transparent;cursor:pointer;font-size:.9rem;transition:all .15s;
-  position:relative}
-.btn-icon:hover{border-color:var(--red);background:#e6394415}
-.btn-icon.copy:hover{border-color:var(--blue);background:#38bdf815}
-.btn-icon.mark-used:hover{border-color:var(--yellow);background:#f59e0b15}
-.btn-icon.del:hover{border-color:var(--red);background:#e6394420}
-.tooltip{position:absolute;bottom:calc(100% + 6px);left:50%;transform:translateX(-50%);
-  background:#1e2d3d;border:1px solid #2a3f55;border-radius:5px;padding:3px 8px;
-  font-family:var(--mono);font-size:.65rem;color:var(--text);white-space:nowrap;
-  pointer-events:none;opacity:0;transition:opacity .15s}
-.btn-icon:hover .tooltip{opacity:1}
-
-/* COPY FEEDBACK */
-.copied{position:fixed;bottom:1.5rem;right:1.5rem;background:#052e16;
-  border:1px solid #166534;color:var(--green);padding:.65rem 1.2rem;
-  border-radius:8px;font-family:var(--mono);font-size:.8rem;z-index:1000;
-  transform:translateY(10px);opacity:0;transition:all .25s;pointer-events:none}
-.copied.show{transform:translateY(0);opacity:1}
-
-/* MODAL */
-.overlay{position:fixed;inset:0;background:#000a;z-index:100;
-  display:none;place-items:center}
-.overlay.open{display:grid}
-.modal{background:var(--surface);border:1px solid #991b1b;border-radius:12px;
-  padding:2rem;width:100%;max-width:400px;position:relative}
-.modal-title{font-size:1.1rem;font-weight:700;color:#fca5a5;margin-bottom:.6rem}
-.modal-sub{font-size:.85rem;color:var(--text-dim);margin-bottom:1.5rem;line-height:1.5}
-.modal-key{font-family:var(--mono);font-size:.78rem;color:var(--blue);
-  background:#080b0f;padding:.5rem .85rem;border-radius:6px;margin-bottom:1.5rem;
-  border:1px solid var(--border);word-break:break-all}
-.modal-actions{display:flex;gap:.75rem;justify-content:flex-end}
-.btn-cancel{font-family:var(--sans);font-size:.88rem;font-weight:600;
-  padding:.55rem 1.2rem;border-radius:7px;border:1px solid var(--border);
-  background:transparent;color:var(--text-dim);cursor:pointer;letter-spacing:.04em}
-.btn-cancel:hover{border-color:#334155;color:var(--text)}
-.btn-confirm{font-family:var(--sans);font-size:.88rem;font-weight:700;
-  padding:.55rem 1.2rem;border-radius:7px;border:none;
-  background:var(--red);color:#fff;cursor:pointer;letter-spacing:.04em;transition:opacity .2s}
-.btn-confirm:hover{opacity:.85}
-
-.empty-state{text-align:center;padding:4rem 2rem;color:var(--text-dim)}
-footer{text-align:center;margin-top:2rem;font-family:var(--mono);font-size:.68rem;color:var(--text-dim);opacity:.4}
-</style>
-</head>
-<body>
-<div class="wrap">
-
-  <header>
-    <div class="logo">
-      <div class="logo-icon">W</div>
-      <div class="logo-name">White<span>External</span> <span style="font-size:.75rem;color:var(--text-dim);font-weight:500">// Admin</span></div>
-    </div>
-    <div class="hdr-right">
-      <span class="chip" id="clock">--:--:--</span>
-      <a href="/" class="chip" style="text-decoration:none;cursor:pointer">← Site</a>
-      <a href="/admin/logout" class="logout">Sair</a>
-    </div>
-  </header>
-
-  <!-- STATS -->
-  <div class="stats">
-    <div class="stat"><div class="stat-bar red-bar"></div>
-      <div class="stat-num c-red">{{ total }}</div><div class="stat-lbl">Total de Keys</div></div>
-    <div class="stat"><div class="stat-bar green-bar"></div>
-      <div class="stat-num c-green">{{ available }}</div><div class="stat-lbl">Disponíveis</div></div>
-    <div class="stat"><div class="stat-bar yellow-bar"></div>
-      <div class="stat-num c-yellow">{{ used_count }}</div><div class="stat-lbl">Utilizadas</div></div>
-    <div class="stat"><div class="stat-bar blue-bar"></div>
-      <div class="stat-num c-blue">{{ expiring_soon }}</div><div class="stat-lbl">Exp. em 3 dias</div></div>
-  </div>
-
-  <!-- TOOLBAR -->
-  <div class="toolbar">
-    <div class="toolbar-left">
-      <span class="section-title"><span class="dot"></span>Gerenciar Keys</span>
-      <button class="filter-btn active" onclick="filter(this,'all')">Todas</button>
-      <button class="filter-btn" onclick="filter(this,'active')">Ativas</button>
-      <button class="filter-btn" onclick="filter(this,'used')">Utilizadas</button>
-    </div>
-    <input class="search" type="text" placeholder="Buscar key..." oninput="search(this.value)">
-  </div>
-
-  <!-- TABLE -->
-  <div class="tbl-wrap">
-    {% if keys %}
-    <table id="keytable">
-      <thead><tr>
-        <th>#</th><th>Key</th><th>Criado por</th><th>Criada em</th><th>Expira em</th><th>Status</th><th>Ações</th>
-      </tr></thead>
-      <tbody>
-      {% for k, v in keys.items() %}
-      <tr class="key-row {% if v.get('used') %}row-used{% endif %}" data-key="{{ k }}" data-used="{{ 'true' if v.get('used') else 'false' }}">
-        <td class="date-mono">{{ loop.index }}</td>
-        <td class="key-mono">{{ k }}</td>
-        <td class="creator">{{ v.get('created_by', '—') }}</td>
-        <td class="date-mono">{{ v.get('created_at','—')[:10] }}</td>
-        <td class="date-mono">{{ v['expires'][:10] }}</td>
-        <td id="badge-{{ loop.index }}">
-          {% if v.get('used') %}
-            <span class="badge b-used">⬡ Utilizada</span>
-          {% else %}
-            <span class="badge b-active">● Ativa</span>
-          {% endif %}
-        </td>
-        <td>
-          <div class="actions">
-            <button class="btn-icon copy" onclick="copyKey('{{ k }}')">
-              📋<span class="tooltip">Copiar Key</span>
-            </button>
-            <button class="btn-icon mark-used" onclick="toggleUsed('{{ k }}', this, '{{ loop.index }}', {{ 'true' if v.get('used') else 'false' }})">
-              {{ '↩' if v.get('used') else '✓' }}<span class="tooltip">{{ 'Desmarcar' if v.get('used') else 'Marcar como Usada' }}</span>
-            </button>
-            <button class="btn-icon del" onclick="confirmDelete('{{ k }}')">
-              🗑<span class="tooltip">Deletar</span>
-            </button>
-          </div>
-        </td>
-      </tr>
-      {% endfor %}
-      </tbody>
-    </table>
-    {% else %}
-    <div class="empty-state">
-      <div style="font-size:2rem;opacity:.2;margin-bottom:1rem">⬡</div>
-      Nenhuma key cadastrada.
-    </div>
-    {% endif %}
-  </div>
-
-  <footer>WHITE EXTERNAL ADMIN PANEL // {{ total }} KEYS REGISTRADAS</footer>
-</div>
-
-<!-- COPY TOAST -->
-<div class="copied" id="toast">✓ Key copiada!</div>
-
-<!-- DELETE MODAL -->
-<div class="overlay" id="del-modal">
-  <div class="modal">
-    <div class="modal-title">⚠ Confirmar exclusão</div>
-    <div class="modal-sub">Você está prestes a remover permanentemente a seguinte key:</div>
-    <div class="modal-key" id="del-key-display"></div>
-    <div class="modal-actions">
-      <button class="btn-cancel" onclick="closeModal()">Cancelar</button>
-      <button class="btn-confirm" onclick="deleteKey()">Deletar</button>
-    </div>
-  </div>
-</div>
-
-<script>
-let pendingDeleteKey = null;
-
-// Clock
-function tick(){
-  const n=new Date();
-  document.getElementById('clock').textContent=n.toLocaleTimeString('pt-BR');
-}
-setInterval(tick,1000); tick();
-
-// Copy
-function copyKey(k){
-  navigator.clipboard.writeText(k);
-  const t=document.getElementById('toast');
-  t.classList.add('show');
-  setTimeout(()=>t.classList.remove('show'),2000);
-}
-
-// Filter
-let currentFilter='all';
-function filter(btn,type){
-  currentFilter=type;
-  document.querySelectorAll('.filter-btn').forEach(b=>b.classList.remove('active'));
-  btn.classList.add('active');
-  applyFilters();
-}
-function search(q){applyFilters(q);}
-function applyFilters(q=''){
-  const val=q.toLowerCase();
-  document.querySelectorAll('.key-row').forEach(row=>{
-    const key=row.dataset.key.toLowerCase();
-    const used=row.dataset.used==='true';
-    const matchSearch=key.includes(val);
-    const matchFilter=currentFilter==='all'||(currentFilter==='active'&&!used)||(currentFilter==='used'&&used);
-    row.style.display=(matchSearch&&matchFilter)?'':'none';
-  });
-}
-
-// Toggle used
-function toggleUsed(key, btn, idx, isUsed){
-  fetch('/admin/api/toggle-used',{
-    method:'POST',
-    headers:{'Content-Type':'application/json'},
-    body:JSON.stringify({key})
-  }).then(r=>r.json()).then(d=>{
-    if(d.ok){
-      const newUsed=d.used;
-      const row=document.querySelector('[data-key="'+key+'"]');
-      row.dataset.used=newUsed?'true':'false';
-      row.classList.toggle('row-used',newUsed);
-      document.getElementById('badge-'+idx).innerHTML=newUsed
-        ?'<span class="badge b-used">⬡ Utilizada</span>'
-        :'<span class="badge b-active">● Ativa</span>';
-      btn.textContent=newUsed?'↩':'✓';
-      btn.querySelector('.tooltip').textContent=newUsed?'Desmarcar':'Marcar como Usada';
-    }
-  });
-}
-
-// Delete modal
-function confirmDelete(key){
-  pendingDeleteKey=key;
-  document.getElementById('del-key-display').textContent=key;
-  document.getElementById('del-modal').classList.add('open');
-}
-function closeModal(){
-  document.getElementById('del-modal').classList.remove('open');
-  pendingDeleteKey=null;
-}
-function deleteKey(){
-  if(!pendingDeleteKey)return;
-  fetch('/admin/api/delete-key',{
-    method:'POST',
-    headers:{'Content-Type':'application/json'},
-    body:JSON.stringify({key:pendingDeleteKey})
-  }).then(r=>r.json()).then(d=>{
-    if(d.ok){
-      document.querySelector('[data-key="'+pendingDeleteKey+'"]').remove();
-    }
-    closeModal();
-  });
-}
-// Close modal on overlay click
-document.getElementById('del-modal').addEventListener('click',function(e){
-  if(e.target===this)closeModal();
-});
-</script>
-</body>
-</html>"""
-
-from flask import Flask, render_template_string, request, redirect, session, jsonify
+from flask import Flask, render_template, request, redirect, session, jsonify, make_response, stream_with_context
+from urllib.parse import urlencode
 from functools import wraps
+import gzip, hashlib, mimetypes, math
 
-flask_app = Flask(__name__)
+flask_app = Flask(__name__, template_folder=os.path.join(BASE_DIR, "template"), static_folder=None)
 flask_app.secret_key = os.environ.get("SECRET_KEY", os.urandom(24).hex())
+flask_app.jinja_env.auto_reload = False
+if TRUSTED_PROXIES:     # remote_addr passa a ser o IP do cliente visto pelo proxy
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    flask_app.wsgi_app = ProxyFix(flask_app.wsgi_app, x_for=TRUSTED_PROXIES)
+
+HTTP_SECONDS  = Histogram("http_request_seconds", "Latência dos handlers HTTP", ("route",))
+HTTP_REQUESTS = Counter("http_requests_total", "Requisições HTTP por rota e status", ("route", "status"))
+STORE_KEYS    = Gauge("keystore_keys", "Keys no store por estado", ("state",),
+                      fn=lambda: {(k,): v for k, v in store.stats().items() if k != "total"})
+STORAGE_BYTES = Gauge("keystore_storage_bytes", "Bytes do backend em disco", ("backend",),
+                      fn=lambda: {(store.backend.name,): store.backend.size()})
+
+@flask_app.after_request
+def count_request(resp):
+    HTTP_REQUESTS.inc(request.url_rule.rule if request.url_rule else "<404>", str(resp.status_code))
+    return resp
+
+TEMPLATES = {name: flask_app.jinja_env.get_template(name)     # compila tudo no boot
+             for name in ("public.html", "admin.html", "login.html")}
+
+def load_assets() -> dict:
+    """nome -> (bytes, bytes gzip, hash do conteúdo, mimetype)."""
+    assets = {}
+    for name in os.listdir(STATIC_DIR):
+        with open(os.path.join(STATIC_DIR, name), "rb") as f:
+            raw = f.read()
+        mime = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        assets[name] = (raw, gzip.compress(raw, 9), hashlib.sha1(raw).hexdigest()[:12], mime)
+    return assets
+
+ASSETS = load_assets()
+
+class ResponseCache:
+    """Corpos prontos (e já comprimidos), válidos enquanto a versão do store não muda.
+
+    Toda mutação/expiração avança store.version, então a invalidação é implícita.
+    A chave vem dos parâmetros já normalizados (nunca da query crua) e o total
+    de bytes é limitado: passando do teto, sai a entrada usada há mais tempo.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes     = 0
+        self._entries  = OrderedDict()  # chave -> (versão, corpo, corpo gzip, mimetype)
+        self._lock     = threading.Lock()
+
+    def get(self, key, version: int):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != version:     # versão velha não volta a servir: libera já
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, version: int, body: bytes, mimetype: str):
+        entry = (version, body, gzip.compress(body, 6), mimetype)
+        size  = len(body) + len(entry[2])
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if size <= self.max_bytes:
+                self._entries[key] = entry
+                self.bytes += size
+                while self.bytes > self.max_bytes:
+                    self._drop(next(iter(self._entries)))
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def _drop(self, key):
+        _, body, gz, _ = self._entries.pop(key)
+        self.bytes -= len(body) + len(gz)
+
+response_cache = ResponseCache(RESPONSE_CACHE_MB * 2 ** 20)
+
+class RateLimiter:
+    """Token bucket por (IP, rota), em memória e com número limitado de buckets (LRU)."""
+
+    def __init__(self, rate: float, burst: int, max_buckets: int):
+        self.rate, self.burst, self.max_buckets = rate, burst, max_buckets
+        self._buckets = OrderedDict()   # (ip, rota) -> [tokens, último acesso]
+        self._lock    = threading.Lock()
+
+    def hit(self, client: str, route: str, now: float | None = None) -> float:
+        """Consome um token; retorna 0 se permitido ou os segundos até o próximo."""
+        now = time.monotonic() if now is None else now
+        key = (client, route)
+        with self._lock:
+            b = self._buckets.get(key)
+            if b is None:
+                b = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                b[0] = min(self.burst, b[0] + (now - b[1]) * self.rate)
+                b[1] = now
+            if b[0] >= 1:
+                b[0] -= 1
+                return 0.0
+            return (1 - b[0]) / self.rate
+
+rate_limiter = RateLimiter(RATE_LIMIT, RATE_BURST, RATE_CLIENTS) if RATE_LIMIT > 0 else None
+if rate_limiter and not TRUSTED_PROXIES:
+    # atrás de proxy sem TRUSTED_PROXIES todo cliente tem o IP do proxy: um bucket só para todos
+    log.warning("RATE_LIMIT ligado sem TRUSTED_PROXIES: atrás de proxy (Railway) todos os clientes dividem o mesmo limite")
+RATE_LIMITED = Counter("http_rate_limited_total", "Requisições recusadas com 429", ("route",))
+
+def cached_response(entry):
+    version, body, gz, mime = entry
+    use_gzip = "gzip" in request.accept_encodings
+    resp = make_response(gz if use_gzip else body)
+    resp.headers["Content-Type"] = mime
+    resp.headers["Vary"]         = "Accept-Encoding"
+    if use_gzip:
+        resp.headers["Content-Encoding"] = "gzip"
+    return resp
+
+def json_entry(key, version: int, body: dict):
+    return response_cache.put(key, version, flask_app.json.dumps(body).encode(), "application/json")
+
+@flask_app.template_global()
+def asset(name: str) -> str:
+    """URL com hash do conteúdo: pode ser cacheada para sempre pelo browser."""
+    return f"/static/{name}?v={ASSETS[name][2]}"
+
+@flask_app.route("/static/<name>")
+def static_asset(name):
+    if name not in ASSETS:
+        return {"error": "not found"}, 404
+    raw, gz, digest, mime = ASSETS[name]
+    use_gzip = "gzip" in request.accept_encodings
+    resp = make_response(gz if use_gzip else raw)
+    resp.headers["Content-Type"]  = mime
+    resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    resp.headers["Vary"]          = "Accept-Encoding"
+    if use_gzip:
+        resp.headers["Content-Encoding"] = "gzip"
+    resp.set_etag(digest)
+    return resp.make_conditional(request)
 
 def login_required(f):
     @wraps(f)
@@ -627,39 +470,128 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated
 
-def get_stats(keys):
-    now = datetime.utcnow()
-    used_count  = sum(1 for v in keys.values() if v.get("used"))
-    available   = sum(1 for v in keys.values() if not v.get("used"))
-    soon = now + timedelta(days=3)
-    expiring_soon = sum(1 for v in keys.values()
-                        if datetime.fromisoformat(v["expires"]) <= soon)
-    return used_count, available, expiring_soon
+def rate_limited(f):
+    """429 quando o IP passa de RATE_LIMIT req/s nesta rota (rotas públicas)."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if rate_limiter is not None:
+            retry = rate_limiter.hit(request.remote_addr, request.endpoint)
+            if retry:
+                RATE_LIMITED.inc(request.endpoint)
+                resp = jsonify(ok=False, error="rate limited")
+                resp.status_code = 429
+                resp.headers["Retry-After"] = str(math.ceil(retry))
+                return resp
+        return f(*args, **kwargs)
+    return decorated
+
+def timed_stream(route: str):
+    """@timed para rotas com stream_page: a duração vai até o fim do stream, não até o return."""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            start   = time.perf_counter()
+            observe = lambda: HTTP_SECONDS.observe(time.perf_counter() - start, route)
+            try:
+                resp = f(*args, **kwargs)
+            except Exception:
+                observe()
+                raise
+            if resp.is_streamed:
+                resp.call_on_close(observe)     # o servidor chama ao terminar de enviar
+            else:
+                observe()
+            return resp
+        return decorated
+    return decorator
+
+def get_stats():
+    """Contadores mantidos pelo store a cada mutação: O(1), sem varrer as keys."""
+    st = store.stats(soon_seconds=3 * 86400)
+    return st["total"], st["used"], st["available"], st["expiring_soon"]
+
+def page_options() -> dict:
+    """Lê ?q=&status=&expira=&sort=&limit=&offset= já normalizados (também servem de chave de cache)."""
+    args = request.args
+    return {
+        "q":      args.get("q", ""),
+        "status": args.get("status", "all"),
+        "expira": args.get("expira", type=int),
+        "sort":   args.get("sort", ""),
+        "limit":  max(1, min(args.get("limit", PAGE_SIZE, type=int), MAX_PAGE_SIZE)),
+        "offset": max(0, args.get("offset", 0, type=int)),
+    }
+
+def page_query(opts: dict) -> dict:
+    """Roda a consulta de page_options() e devolve a página pronta para o template."""
+    rows, matched = query_keys(opts["q"], opts["status"], opts["expira"],
+                               opts["sort"], opts["limit"], opts["offset"])
+
+    def url(offset):
+        params = {k: v for k, v in {**opts, "offset": offset}.items() if v not in ("", None, 0)}
+        if params.get("status") == "all": del params["status"]
+        if params.get("limit") == PAGE_SIZE: del params["limit"]
+        return f"{request.path}?{urlencode(params)}" if params else request.path
+
+    limit, offset = opts["limit"], opts["offset"]
+    return {**opts, "rows": rows, "matched": matched,
+            "prev_url": url(max(0, offset - limit)) if offset > 0 else None,
+            "next_url": url(offset + limit) if offset + limit < matched else None}
+
+def stream_page(name: str, cache_as: tuple | None = None, **context):
+    """Renderiza em streaming: as primeiras linhas saem antes da tabela inteira ficar pronta.
+
+    Com cache_as=(chave, versão), o HTML gerado também vai para o response_cache.
+    """
+    flask_app.update_template_context(context)
+    stream = TEMPLATES[name].stream(context)
+    stream.enable_buffering(64)
+    if cache_as is not None:
+        stream = tee_to_cache(stream, *cache_as)
+    return flask_app.response_class(stream_with_context(stream), mimetype="text/html")
+
+def tee_to_cache(chunks, key, version: int):
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    response_cache.put(key, version, "".join(parts).encode(), "text/html; charset=utf-8")
 
 @flask_app.route("/")
+@timed_stream("/")
+@rate_limited
 def index():
-    keys = clean_expired()
-    used_count, available, _ = get_stats(keys)
-    return render_template_string(PUBLIC_HTML, keys=keys,
-                                  total=len(keys), used_count=used_count, available=available)
+    version = store.version
+    opts    = page_options()
+    key     = ("/", *opts.values())
+    entry   = response_cache.get(key, version)
+    if entry is not None:
+        return cached_response(entry)
+    page = page_query(opts)
+    total, used_count, available, _ = get_stats()
+    return stream_page("public.html", cache_as=(key, version),
+                       keys=page["rows"], page=page,
+                       total=total, used_count=used_count, available=available)
 
 @flask_app.route("/admin")
 @login_required
+@timed_stream("/admin")
 def admin():
-    keys = clean_expired()
-    used_count, available, expiring_soon = get_stats(keys)
-    return render_template_string(ADMIN_HTML, keys=keys, total=len(keys),
-                                  used_count=used_count, available=available,
-                                  expiring_soon=expiring_soon)
+    page = page_query(page_options())
+    total, used_count, available, expiring_soon = get_stats()
+    return stream_page("admin.html", keys=page["rows"], page=page, total=total,
+                       used_count=used_count, available=available,
+                       expiring_soon=expiring_soon)
 
 @flask_app.route("/admin/login", methods=["GET","POST"])
+@rate_limited
 def admin_login():
     if request.method == "POST":
         if request.form.get("password") == ADMIN_PASSWORD:
             session["admin"] = True
             return redirect("/admin")
-        return render_template_string(LOGIN_HTML, error="Senha incorreta.")
-    return render_template_string(LOGIN_HTML, error=None)
+        return render_template("login.html", error="Senha incorreta.")
+    return render_template("login.html", error=None)
 
 @flask_app.route("/admin/logout")
 def admin_logout():
@@ -671,38 +603,158 @@ def admin_logout():
 def api_toggle_used():
     data = request.get_json()
     key  = data.get("key","").strip().upper()
-    keys = load_keys()
-    if key not in keys:
+    if isinstance(data.get("used"), bool):
+        # valor explícito: dois admins clicando juntos convergem em vez de se desfazer
+        used = data["used"] if store.set_used(key, data["used"]) else None
+    else:
+        used = store.toggle_used(key)
+    if used is None:
         return jsonify(ok=False, error="not found"), 404
-    keys[key]["used"] = not keys[key].get("used", False)
-    save_keys(keys)
-    return jsonify(ok=True, used=keys[key]["used"])
+    return jsonify(ok=True, used=used)
 
 @flask_app.route("/admin/api/delete-key", methods=["POST"])
 @login_required
 def api_delete_key():
     data = request.get_json()
     key  = data.get("key","").strip().upper()
-    keys = load_keys()
-    if key not in keys:
+    if not store.delete(key):
         return jsonify(ok=False, error="not found"), 404
-    del keys[key]
-    save_keys(keys)
     return jsonify(ok=True)
 
+@flask_app.route("/admin/api/stats")
+@login_required
+def api_stats():
+    return jsonify(store.stats())
+
+@flask_app.route("/admin/api/bulk-create", methods=["POST"])
+@login_required
+@timed(HTTP_SECONDS, "/admin/api/bulk-create")
+def api_bulk_create():
+    data  = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify(ok=False, error="expected a JSON object"), 400
+    count = data.get("count")
+    delta = parse_duration(str(data.get("duracao", "")))
+    if type(count) is not int or not 1 <= count <= MAX_BULK:     # bool é subclasse de int
+        return jsonify(ok=False, error=f"count must be 1..{MAX_BULK}"), 400
+    if not delta:
+        return jsonify(ok=False, error="invalid duracao"), 400
+    keys, expires = create_keys(count, delta, "painel")
+    log.info(f"{len(keys)} keys criadas pelo painel")
+    resp = make_response(keys_file(keys, expires))
+    resp.headers["Content-Type"] = "text/plain; charset=utf-8"
+    resp.headers["Content-Disposition"] = f"attachment; filename=keys-{len(keys)}.txt"
+    return resp
+
 @flask_app.route("/keys")
+@timed(HTTP_SECONDS, "/keys")
+@rate_limited
 def keys_json():
-    """Endpoint consumido pelo loader C++ para validar keys."""
-    keys = clean_expired()
-    return {"keys": list(keys.keys())}, 200
+    """Endpoint consumido pelo loader C++ para validar keys.
+
+    Responde 304 se o ETag (versão do store) não mudou; com ?since=<versão>
+    devolve só as keys adicionadas/removidas desde então. Com FEED_PORT
+    ligado (e exposto), o loader pode em vez disso seguir o feed SSE em
+    :FEED_PORT/keys/events a partir de `version` (ver feed.py).
+    """
+    # lista completa: uma entrada por versão; delta: só quando changes_since
+    # devolveu um, pela versão `since` normalizada (since velho cai na completa)
+    version = store.version
+    since   = request.args.get("since", type=int)
+    entry   = response_cache.get(("/keys", since), version) if since is not None else None
+    if entry is None:
+        delta = store.changes_since(since) if since is not None else None
+        if delta is not None:
+            added, removed, version = delta
+            entry = json_entry(("/keys", since), version,
+                               {"version": version, "added": added, "removed": removed})
+        else:
+            entry = response_cache.get(("/keys",), version)
+            if entry is None:
+                keys, version = store.keys_with_version()
+                entry = json_entry(("/keys",), version, {"version": version, "keys": keys})
+    resp = cached_response(entry)
+    resp.set_etag(str(entry[0]))
+    return resp.make_conditional(request)
+
+def validation_body(status: str, exp: float | None) -> dict:
+    return {"status": status} if exp is None else {"status": status, "expires": exp}
+
+@flask_app.route("/keys/validate", methods=["GET", "POST"])
+@timed(HTTP_SECONDS, "/keys/validate")
+@rate_limited
+def keys_validate():
+    """Validação de uma única key pelo loader, sem baixar a lista inteira."""
+    if request.method == "POST":
+        data = request.get_json(silent=True)
+        if data is None:
+            data = request.form
+        key  = data.get("key", "") if isinstance(data, dict) else None
+    else:
+        key  = request.args.get("key", "")
+    if not isinstance(key, str) or not key.strip():
+        return {"error": "expected {\"key\": str}"}, 400
+    status, _, exp = lookup_key(key)
+    return validation_body(status, exp), 200
+
+@flask_app.route("/keys/validate/batch", methods=["POST"])
+@timed(HTTP_SECONDS, "/keys/validate/batch")
+@rate_limited
+def keys_validate_batch():
+    """Valida várias keys numa única requisição: {"keys": [...]}."""
+    data = request.get_json(silent=True)
+    keys = data.get("keys") if isinstance(data, dict) else None
+    if not isinstance(keys, list) or not all(isinstance(k, str) for k in keys):
+        return {"error": "expected {\"keys\": [str, ...]}"}, 400
+    if len(keys) > MAX_BATCH:
+        return {"error": f"batch too large (max {MAX_BATCH})"}, 413
+    now     = time.time()
+    results = {}
+    for k in keys:
+        k = k.strip().upper()
+        if k in results:
+            continue
+        status, _, exp = lookup_key(k, now)
+        results[k] = validation_body(status, exp)
+    return {"results": results}, 200
+
+@flask_app.route("/keys/token-key")
+@rate_limited
+def token_key():
+    """Chave pública para o loader validar tokens offline (só com ed25519)."""
+    if token_signer is None or token_signer.alg != "ed25519":
+        return jsonify(ok=False, error="not found"), 404
+    return {"alg": token_signer.alg, "public_key": token_signer.public_key}
 
 @flask_app.route("/health")
+@timed(HTTP_SECONDS, "/health")
+@rate_limited
 def health():
-    return {"status": "ok", "keys": len(load_keys())}, 200
+    version = store.version
+    entry   = response_cache.get("/health", version)
+    if entry is None:
+        entry = json_entry("/health", version, {"status": "ok", "keys": len(store)})
+    return cached_response(entry)
+
+@flask_app.route("/metrics")
+def metrics():
+    """Métricas no formato texto do Prometheus."""
+    return REGISTRY.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
 
 def run_flask():
     port = int(os.environ.get("PORT", 8080))
-    flask_app.run(host="0.0.0.0", port=port, use_reloader=False)
+    if WEB_SERVER == "waitress":
+        try:
+            from waitress import serve
+        except ImportError:
+            log.warning("waitress não instalado; usando o servidor de desenvolvimento do Flask")
+        else:
+            log.info(f"Servindo com waitress ({WEB_THREADS} threads, backlog {WEB_BACKLOG})")
+            serve(flask_app, host="0.0.0.0", port=port, threads=WEB_THREADS,
+                  backlog=WEB_BACKLOG, channel_timeout=WEB_KEEPALIVE,
+                  connection_limit=WEB_CONNECTIONS, ident="white")
+            return
+    flask_app.run(host="0.0.0.0", port=port, use_reloader=False, threaded=True)
 
 # =========================
 # DISCORD BOT
@@ -714,6 +766,17 @@ intents.members = True
 bot  = discord.Client(intents=intents)
 tree = app_commands.CommandTree(bot)
 
+COMMAND_SECONDS = Histogram("discord_command_seconds", "Latência dos slash commands", ("command",))
+LOOP_LAG        = Gauge("event_loop_lag_seconds", "Atraso do loop asyncio do bot")
+
+async def monitor_loop_lag(interval: float = 1.0):
+    """Mede quanto um sleep de `interval` atrasa: é o tempo que o loop ficou bloqueado."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG.set(value=max(0.0, loop.time() - start - interval))
+
 def is_admin(interaction: discord.Interaction) -> bool:
     if not ADMIN_ROLE_ID:
         return interaction.user.guild_permissions.administrator
@@ -725,6 +788,74 @@ def error_embed(msg: str) -> discord.Embed:
 def success_embed(title: str) -> discord.Embed:
     return discord.Embed(title=title, color=0x7c3aed)
 
+# ── expiração em background ───────────────────────────────────────────────────
+class ExpiryScheduler:
+    """Dorme até o próximo vencimento do heap do store e remove as keys vencidas em lotes.
+
+    É o único caminho de limpeza: nenhuma rota ou comando paga por ela.
+    """
+
+    def __init__(self):
+        self.deadline = None        # epoch do vencimento que o scheduler está esperando
+        self._wake    = asyncio.Event()
+        self._loop    = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        store.subscribe(self._on_change)
+        self._loop.create_task(self._run(), name="expiry-scheduler")
+
+    def _on_change(self, version, op, key):
+        # key nova vencendo antes do prazo atual: acorda para reagendar
+        if op in ("add", "upd") and (self.deadline is None or store.get(key).expires < self.deadline):
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _run(self):
+        while True:
+            self.deadline = store.next_expiry()
+            delay = None if self.deadline is None else max(0.0, self.deadline - time.time())
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                continue                        # prazo mudou: recalcula
+            except asyncio.TimeoutError:
+                pass
+            expired = []
+            while True:
+                batch = store.purge_expired(limit=EXPIRY_BATCH)
+                if not batch:
+                    break
+                expired += batch
+                await asyncio.to_thread(store.flush)    # uma gravação por lote
+            if expired:
+                log.info(f"{len(expired)} key(s) expirada(s) removida(s)")
+                await self._report(expired)
+
+    async def _report(self, expired: list[str]):
+        if not LOG_CHANNEL_ID:
+            return
+        channel = bot.get_channel(LOG_CHANNEL_ID)
+        if channel is None:
+            return
+        embed = discord.Embed(title=f"⌛ {len(expired)} key(s) expirada(s)", color=0xf59e0b,
+                              description="\n".join(f"`{k}`" for k in expired[:15]))
+        if len(expired) > 15:
+            embed.set_footer(text=f"... e mais {len(expired)-15} keys.")
+        try:
+            await channel.send(embed=embed)
+        except discord.HTTPException:
+            log.exception("Falha ao enviar resumo de expiração")
+
+expiry_scheduler = ExpiryScheduler()
+revocation_feed  = RevocationFeed(store)
+
+@bot.event
+async def setup_hook():
+    expiry_scheduler.start()
+    bot.loop.create_task(monitor_loop_lag(), name="loop-lag")
+    if FEED_PORT:
+        await revocation_feed.start(FEED_PORT)
+
 # ── on_ready ──────────────────────────────────────────────────────────────────
 @bot.event
 async def on_ready():
@@ -747,6 +878,7 @@ async def on_ready():
 # ── /createkey ────────────────────────────────────────────────────────────────
 @tree.command(name="createkey", description="Criar uma nova key de acesso")
 @app_commands.describe(duracao="Ex: 7d, 30d, 3m, 1a, 12h")
+@timed(COMMAND_SECONDS, "createkey")
 async def createkey(interaction: discord.Interaction, duracao: str):
     if not is_admin(interaction):
         return await interaction.response.send_message(embed=error_embed("Você não tem permissão."), ephemeral=True)
@@ -758,87 +890,142 @@ async def createkey(interaction: discord.Interaction, duracao: str):
             ephemeral=True
         )
 
-    now     = datetime.utcnow()
-    expires = now + delta
-    key     = generate_key()
-    keys    = load_keys()
-    keys[key] = {
-        "expires":    expires.isoformat(),
-        "created_by": interaction.user.id,
-        "created_at": now.isoformat(),
-    }
-    save_keys(keys)
+    [key], expires = create_keys(1, delta, interaction.user.id)
 
     embed = success_embed("🔑 Key Criada com Sucesso")
     embed.add_field(name="Key", value=f"```{key}```", inline=False)
-    embed.add_field(name="Expira em",   value=f"<t:{int(expires.timestamp())}:F>", inline=True)
+    embed.add_field(name="Expira em",   value=f"<t:{expires}:F>", inline=True)
     embed.add_field(name="Criada por",  value=interaction.user.mention, inline=True)
-    embed.set_footer(text=f"Total de keys ativas: {len(keys)}")
+    if token_signer:
+        token = token_signer.sign(key, expires)
+        embed.add_field(name="Token", value=f"```{token}```", inline=False)
+    embed.set_footer(text=f"Total de keys ativas: {len(store)}")
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
+# ── /createkeys ───────────────────────────────────────────────────────────────
+@tree.command(name="createkeys", description="Criar várias keys de uma vez")
+@app_commands.describe(quantidade="Quantas keys gerar", duracao="Ex: 7d, 30d, 3m, 1a, 12h")
+@timed(COMMAND_SECONDS, "createkeys")
+async def createkeys(interaction: discord.Interaction,
+                     quantidade: app_commands.Range[int, 1, MAX_BULK], duracao: str):
+    if not is_admin(interaction):
+        return await interaction.response.send_message(embed=error_embed("Você não tem permissão."), ephemeral=True)
+
+    delta = parse_duration(duracao)
+    if not delta:
+        return await interaction.response.send_message(
+            embed=error_embed("Duração inválida. Use: `7d`, `30d`, `3m`, `1a`, `12h`"),
+            ephemeral=True
+        )
+
+    # geração em lote é CPU pura: fora do loop para não atrasar o heartbeat do gateway
+    keys, expires = await asyncio.to_thread(create_keys, quantidade, delta, interaction.user.id)
+    body = await asyncio.to_thread(keys_file, keys, expires)    # assinar até MAX_BULK tokens também é CPU
+    log.info(f"{len(keys)} keys criadas por {interaction.user}")
+    await interaction.response.send_message(
+        content=f"🔑 **{len(keys)} keys criadas** — expiram em <t:{expires}:F>",
+        file=discord.File(io.BytesIO(body), filename=f"keys-{len(keys)}.txt"),
+        ephemeral=True
+    )
+
 # ── /deletekey ────────────────────────────────────────────────────────────────
 @tree.command(name="deletekey", description="Remover uma key existente")
 @app_commands.describe(key="A key a ser removida (ex: WHITE-XXXX-XXXX-XXXX)")
+@timed(COMMAND_SECONDS, "deletekey")
 async def deletekey(interaction: discord.Interaction, key: str):
     if not is_admin(interaction):
         return await interaction.response.send_message(embed=error_embed("Você não tem permissão."), ephemeral=True)
 
-    keys = load_keys()
-    key  = key.strip().upper()
-    if key not in keys:
+    key = key.strip().upper()
+    if not store.delete(key):
         return await interaction.response.send_message(embed=error_embed("Key não encontrada."), ephemeral=True)
 
-    del keys[key]
-    save_keys(keys)
-
     embed = success_embed("🗑️ Key Removida")
     embed.add_field(name="Key", value=f"```{key}```", inline=False)
-    embed.set_footer(text=f"Keys restantes: {len(keys)}")
+    embed.set_footer(text=f"Keys restantes: {len(store)}")
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
+async def key_autocomplete(interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+    # só admins recebem sugestões: /checkkey é público e não pode listar keys
+    if not is_admin(interaction):
+        return []
+    choices = []
+    for k in key_index.search(current):
+        rec = store.get(k)
+        if rec is not None:
+            label = f"{k} — expira {rec.expires_date}" + (" · usada" if rec.used else "")
+            choices.append(app_commands.Choice(name=label, value=k))
+    return choices
+
+deletekey.autocomplete("key")(key_autocomplete)
+
 # ── /listkeys ─────────────────────────────────────────────────────────────────
 @tree.command(name="listkeys", description="Listar todas as keys ativas")
+@timed(COMMAND_SECONDS, "listkeys")
 async def listkeys(interaction: discord.Interaction):
     if not is_admin(interaction):
         return await interaction.response.send_message(embed=error_embed("Você não tem permissão."), ephemeral=True)
 
-    keys = clean_expired()
-    embed = success_embed(f"📋 Keys Ativas ({len(keys)})")
+    total = len(store)
+    embed = success_embed(f"📋 Keys Ativas ({total})")
 
-    if not keys:
+    if not total:
         embed.description = "Nenhuma key ativa no momento."
     else:
-        lines = []
-        for k, v in list(keys.items())[:15]:   # máx 15 para não estourar embed
-            exp_ts = int(datetime.fromisoformat(v["expires"]).timestamp())
-            lines.append(f"`{k}` — <t:{exp_ts}:d>")
+        lines = [f"`{k}` — <t:{rec.expires}:d>"
+                 for k, rec in store.head(15)]   # máx 15 para não estourar embed
         embed.description = "\n".join(lines)
-        if len(keys) > 15:
-            embed.set_footer(text=f"... e mais {len(keys)-15} keys. Veja o dashboard completo.")
+        if total > 15:
+            embed.set_footer(text=f"... e mais {total-15} keys. Veja o dashboard completo.")
 
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 # ── /checkkey ─────────────────────────────────────────────────────────────────
 @tree.command(name="checkkey", description="Verificar se uma key é válida")
 @app_commands.describe(key="A key a verificar")
+@timed(COMMAND_SECONDS, "checkkey")
 async def checkkey(interaction: discord.Interaction, key: str):
-    keys = clean_expired()
-    key  = key.strip().upper()
+    key = key.strip().upper()
+    status, _, exp = lookup_key(key)
 
-    if key in keys:
-        exp_ts = int(datetime.fromisoformat(keys[key]["expires"]).timestamp())
+    if status == "valid":
         embed  = success_embed("✅ Key Válida")
         embed.add_field(name="Key",    value=f"```{key}```", inline=False)
-        embed.add_field(name="Expira", value=f"<t:{exp_ts}:F>", inline=False)
+        embed.add_field(name="Expira", value=f"<t:{exp}:F>", inline=False)
     else:
         embed = error_embed("Key inválida ou expirada.")
 
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
+checkkey.autocomplete("key")(key_autocomplete)
+
 # =========================
 # INICIALIZAÇÃO
 # =========================
-if __name__ == "__main__":
-    threading.Thread(target=run_flask, daemon=True).start()
+# O loop asyncio é do bot. O servidor web roda em threads próprias e só
+# toca o KeyStore (memória + locks curtos); nenhum comando faz I/O de
+# disco no loop — a gravação fica com o flusher do store.
+# Com RUN_BOT=0 o processo é só uma réplica web: o bot (e a expiração)
+# roda em outro processo e o estado chega pelo backend compartilhado.
+async def main():
+    threading.Thread(target=run_flask, name="web", daemon=True).start()
     log.info("Flask iniciado em background.")
-    bot.run(BOT_TOKEN, log_handler=None)
+    try:
+        if RUN_BOT:
+            async with bot:
+                await bot.start(BOT_TOKEN)
+        else:
+            if not store.backend.shared:
+                log.warning(f"RUN_BOT=0 com backend local ({store.backend}): nada vai expirar nem sincronizar")
+            if FEED_PORT:
+                await revocation_feed.start(FEED_PORT)
+            await asyncio.Event().wait()
+    finally:
+        await revocation_feed.stop()
+        await asyncio.to_thread(store.flush)    # último flush fora do loop
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
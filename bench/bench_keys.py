@@ -0,0 +1,135 @@
+"""Benchmarks do KeyStore e dos endpoints HTTP, com saída em JSON.
+
+Para cada tamanho semeia um store novo e mede load/save do backend, purge
+de expiradas, stats e latência (p50/p99) + throughput via test client do
+Flask em /keys, /keys/validate e /admin. Rodar sempre com os mesmos
+argumentos para comparar execuções:
+
+    python bench/bench_keys.py --sizes 1000,10000,100000,1000000 --backend json --out bench.json
+"""
+import os, sys, json, time, random, tempfile, argparse, platform, statistics
+from datetime import datetime, timedelta
+
+TMP = tempfile.mkdtemp(prefix="bench-")
+os.environ.setdefault("BOT_TOKEN", "bench")
+os.environ["RATE_LIMIT"]  = "0"       # mede o handler, não o limitador
+os.environ["DB_FILE"]     = os.path.join(TMP, "app.json")
+os.environ["SQLITE_FILE"] = os.path.join(TMP, "app.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+from keystore import KeyStore, KeyRecord  # noqa: E402
+from storage import JsonBackend, SqliteBackend, JournalBackend  # noqa: E402
+
+BACKENDS = {"json": JsonBackend, "sqlite": SqliteBackend, "journal": JournalBackend}
+
+
+def seed_records(n: int, expired_ratio: float, rng: random.Random) -> dict:
+    now  = datetime.utcnow()
+    recs = {}
+    while len(recs) < n:
+        key = "WHITE-" + "-".join("".join(rng.choices(app.KEY_ALPHABET, k=4)) for _ in range(3))
+        if rng.random() < expired_ratio:
+            expires = now - timedelta(minutes=rng.randint(1, 600))
+        else:
+            expires = now + timedelta(hours=rng.randint(1, 24 * 90))
+        recs[key] = {"expires": expires.isoformat(), "created_by": 1,
+                     "created_at": now.isoformat(), "used": rng.random() < 0.3}
+    return recs
+
+
+def clock(fn, repeat: int = 1) -> float:
+    """Melhor tempo (s) de `repeat` execuções."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def latency(client, url: str, n: int, before=None, **kwargs) -> dict:
+    samples = []
+    start = time.perf_counter()
+    for i in range(n):
+        if before:
+            before(i)
+        t = time.perf_counter()
+        resp = client.get(url(i) if callable(url) else url, **kwargs)
+        resp.get_data()          # consome respostas em streaming
+        samples.append(time.perf_counter() - t)
+    total = time.perf_counter() - start
+    samples.sort()
+    return {
+        "requests": n,
+        "req_per_s": round(n / total, 1),
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 3),
+        "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+    }
+
+
+def bench_size(n: int, backend_name: str, requests: int, rng: random.Random) -> dict:
+    records = seed_records(n, 0.01, rng)
+    path    = os.path.join(TMP, f"keys-{n}.{backend_name}")
+    backend = BACKENDS[backend_name](path)
+    result  = {"keys": n}
+
+    result["save_full_s"] = round(clock(lambda: backend.save(dict(records), dict(records))), 4)
+    result["bytes"]       = backend.size()
+    result["load_s"]      = round(clock(backend.load, repeat=3), 4)
+
+    store = KeyStore(backend, flush_delay=3600)      # flush manual: fora das medições HTTP
+    one   = {k: KeyRecord.from_dict(v) for k, v in [next(iter(records.items()))]}
+    key   = next(iter(one))
+    result["save_one_change_s"] = round(clock(lambda: (store.put(key, one[key]), store.flush()), repeat=5), 5)
+    expired_before = len(store)
+    result["purge_expired_s"] = round(clock(store.purge_expired), 5)
+    result["purged"]          = expired_before - len(store)
+    result["purge_noop_s"]    = round(clock(store.purge_expired, repeat=5), 6)
+    result["stats_s"]         = round(clock(store.stats, repeat=20), 6)
+
+    app.store = store
+    app.response_cache.clear()
+    client = app.flask_app.test_client()
+    with client.session_transaction() as s:
+        s["admin"] = True
+    keys = list(store.snapshot())
+    http_n = max(10, min(requests, requests * 1000 // max(n, 1)))   # /keys completo é O(n): menos iterações
+    result["http"] = {
+        "keys_cached":   latency(client, "/keys", requests),
+        "keys_uncached": latency(client, "/keys", http_n, before=lambda i: app.response_cache.clear()),
+        "keys_304":      latency(client, "/keys", requests, headers={"If-None-Match": f'"{store.version}"'}),
+        "validate":      latency(client, lambda i: f"/keys/validate?key={keys[i % len(keys)]}", requests),
+        "admin_page":    latency(client, "/admin", max(10, requests // 10)),
+    }
+    store.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="json")
+    parser.add_argument("--requests", type=int, default=500, help="requisições por endpoint")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--out", help="arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report = {
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "python":    platform.python_version(),
+        "backend":   args.backend,
+        "results":   [bench_size(int(n), args.backend, args.requests, rng) for n in args.sizes.split(",")],
+    }
+    out = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(out + "\n")
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    main()
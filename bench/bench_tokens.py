@@ -0,0 +1,59 @@
+"""Throughput de emissão e verificação de tokens assinados (ed25519 e hmac), em JSON.
+
+    python bench/bench_tokens.py [--n 20000] [--out tokens.json]
+"""
+import os, sys, json, time, argparse, platform
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tokens import Ed25519Signer, Ed25519Verifier, HmacSigner, new_seed  # noqa: E402
+
+
+def rate(fn, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return round(len(items) / (time.perf_counter() - start))
+
+
+def bench(signer, verifier, n: int) -> dict:
+    keys    = [f"WHITE-{i:04d}-BENC-HTOK" for i in range(n)]
+    exp     = int(time.time()) + 86400
+    for k in keys[:100]:                                       # aquece
+        verifier.verify(signer.sign(k, exp))
+    sign_s  = rate(lambda k: signer.sign(k, exp), keys)
+    tokens  = [signer.sign(k, exp) for k in keys]
+    assert all(verifier.verify(t)[0] == "valid" for t in tokens[:100])
+    return {
+        "alg":         signer.alg,
+        "token_bytes": len(tokens[0]),
+        "sign_per_s":  sign_s,
+        "verify_per_s": rate(verifier.verify, tokens),
+        "reject_per_s": rate(verifier.verify, [t[:-4] + "AAAA" for t in tokens]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=20000, help="tokens por medição")
+    parser.add_argument("--out", help="arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    ed   = Ed25519Signer(new_seed())
+    hmac = HmacSigner("bench-secret")
+    report = {
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "python":    platform.python_version(),
+        "results":   [bench(ed, Ed25519Verifier(ed.public_key), args.n), bench(hmac, hmac, args.n)],
+    }
+    out = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(out + "\n")
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Convergência de réplicas sobre o backend Redis.
+
+Sobe N KeyStores (um por "réplica") apontando para o mesmo Redis, faz
+creates/toggles/deletes concorrentes em todos e confere que, depois das
+mensagens pub/sub, toda réplica e um load novo enxergam o mesmo estado,
+na mesma versão e com o mesmo delta a partir de uma versão de outra réplica.
+
+    python bench/replicas_redis.py --fake              # fakeredis em memória
+    python bench/replicas_redis.py --url redis://localhost:6379/15
+"""
+import os, sys, json, time, random, argparse, threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keystore import KeyStore, KeyRecord  # noqa: E402
+from storage import RedisBackend  # noqa: E402
+
+
+def worker(store: KeyStore, n: int, seed: int):
+    rng = random.Random(seed)
+    now = int(time.time())
+    mine = []
+    for i in range(n):
+        key = f"R{seed}-{i}"
+        store.put(key, KeyRecord(now + rng.randint(60, 86400), now, seed))
+        mine.append(key)
+        if rng.random() < 0.3:
+            store.toggle_used(rng.choice(mine))
+        if rng.random() < 0.2:
+            store.delete(mine.pop(rng.randrange(len(mine))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="redis://localhost:6379/15")
+    parser.add_argument("--fake", action="store_true", help="usa fakeredis em vez de um redis-server")
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--ops", type=int, default=2000, help="keys criadas por réplica")
+    args = parser.parse_args()
+
+    prefix = f"bench-{os.getpid()}"
+    if args.fake:
+        import fakeredis
+        server = fakeredis.FakeServer()
+        client = lambda: fakeredis.FakeRedis(server=server)
+    else:
+        import redis
+        client = lambda: redis.Redis.from_url(args.url)
+    backend = lambda: RedisBackend(args.url, prefix, client=client())
+
+    stores  = [KeyStore(backend(), flush_delay=0.01) for _ in range(args.replicas)]
+    threads = [threading.Thread(target=worker, args=(s, args.ops, i)) for i, s in enumerate(stores)]
+    start = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    for s in stores: s.flush()
+    elapsed = time.perf_counter() - start
+
+    def converge():
+        expected = {k: KeyRecord.from_dict(v) for k, v in backend().load().items()}
+        deadline = time.time() + 10
+        while time.time() < deadline and any(s.snapshot() != expected for s in stores):
+            time.sleep(0.05)
+        return expected
+
+    expected = converge()
+    diverged = [i for i, s in enumerate(stores) if s.snapshot() != expected]
+
+    # ETag/since de uma réplica tem que valer em todas
+    since = stores[0].version
+    worker(stores[-1], 50, len(stores))
+    stores[-1].flush()
+    expected = converge()
+    deltas   = [s.changes_since(since) for s in stores]
+    deltas   = [d and (sorted(d[0]), sorted(d[1]), d[2]) for d in deltas]
+    diverged += [i for i, (s, d) in enumerate(zip(stores, deltas))
+                 if s.snapshot() != expected or d is None or d != deltas[0]]
+
+    for s in stores: s.close()
+    r = client()
+    r.delete(f"{prefix}:keys", f"{prefix}:expires", f"{prefix}:version")
+    print(json.dumps({
+        "replicas":  args.replicas,
+        "ops":       args.replicas * args.ops,
+        "seconds":   round(elapsed, 3),
+        "keys":      len(expected),
+        "versions":  sorted({s.version for s in stores}),
+        "diverged":  diverged,
+    }, indent=2))
+    sys.exit(1 if diverged else 0)
+
+
+if __name__ == "__main__":
+    main()
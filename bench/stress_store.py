@@ -0,0 +1,117 @@
+"""Stress de concorrência: creates/deletes/toggles simultâneos pelo painel e pelo bot.
+
+Cada worker cria keys, remove metade delas e marca as restantes como usadas.
+No fim o store (e o que foi persistido) tem que conter exatamente as keys
+mantidas, todas com used=True — qualquer diferença é update perdido.
+
+    python bench/stress_store.py [--web 4] [--bot 4] [--ops 500]
+"""
+import os, sys, json, time, asyncio, threading, tempfile, argparse
+from types import SimpleNamespace
+
+TMP = tempfile.mkdtemp(prefix="stress-")
+os.environ.setdefault("BOT_TOKEN", "stress")
+os.environ["DB_FILE"]     = os.path.join(TMP, "keys.json")
+os.environ["SQLITE_FILE"] = os.path.join(TMP, "keys.db")
+os.environ["FLUSH_DELAY"] = "0.01"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app  # noqa: E402
+
+
+class FakeResponse:
+    async def send_message(self, content=None, **kwargs):
+        self.sent = SimpleNamespace(content=content, **kwargs)
+
+
+def fake_interaction():
+    user = SimpleNamespace(id=42, mention="<@42>", roles=[],
+                           guild_permissions=SimpleNamespace(administrator=True))
+    return SimpleNamespace(user=user, response=FakeResponse())
+
+
+def web_worker(ops: int, kept: list, errors: list):
+    client = app.flask_app.test_client()
+    with client.session_transaction() as s:
+        s["admin"] = True
+    mine = []
+    for _ in range(ops):
+        r = client.post("/admin/api/bulk-create", json={"count": 1, "duracao": "30d"})
+        mine.append(r.get_data(as_text=True).strip())
+    for i, key in enumerate(mine):
+        if i % 2:
+            r = client.post("/admin/api/delete-key", json={"key": key})
+        else:
+            r = client.post("/admin/api/toggle-used", json={"key": key, "used": True})
+            kept.append(key)
+        if r.status_code != 200:
+            errors.append(("web", key, r.status_code))
+
+
+async def bot_worker(ops: int, kept: list, errors: list):
+    mine = []
+    for _ in range(ops):
+        inter = fake_interaction()
+        await app.createkey.callback(inter, "30d")
+        mine.append(inter.response.sent.embed.fields[0].value.strip("`"))
+        await asyncio.sleep(0)
+    for i, key in enumerate(mine):
+        if i % 2:
+            inter = fake_interaction()
+            await app.deletekey.callback(inter, key)
+            if "Removida" not in (inter.response.sent.embed.title or ""):
+                errors.append(("bot", key, "delete"))
+        else:
+            if not app.store.set_used(key, True):
+                errors.append(("bot", key, "set_used"))
+            kept.append(key)
+        await asyncio.sleep(0)
+
+
+def run_bot_side(n: int, ops: int, kept: list, errors: list):
+    async def main():
+        await asyncio.gather(*(bot_worker(ops, kept, errors) for _ in range(n)))
+    asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--web", type=int, default=4, help="threads simulando o painel")
+    parser.add_argument("--bot", type=int, default=4, help="tasks simulando slash commands")
+    parser.add_argument("--ops", type=int, default=500, help="keys criadas por worker")
+    args = parser.parse_args()
+    app.ADMIN_ROLE_ID = 0
+
+    kept, errors = [], []
+    threads = [threading.Thread(target=web_worker, args=(args.ops, kept, errors)) for _ in range(args.web)]
+    threads.append(threading.Thread(target=run_bot_side, args=(args.bot, args.ops, kept, errors)))
+    start = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    elapsed = time.perf_counter() - start
+    app.store.flush()
+
+    total_ops = (args.web + args.bot) * args.ops * 2      # create + (delete | set used)
+    persisted = app.store.backend.load()
+    expected  = set(kept)
+    problems  = list(errors)
+    if set(app.store.snapshot()) != expected:
+        problems.append(("memória", len(app.store), len(expected)))
+    if set(persisted) != expected:
+        problems.append(("persistido", len(persisted), len(expected)))
+    if not all(persisted.get(k, {}).get("used") for k in expected):
+        problems.append(("used", "toggle perdido"))
+
+    print(json.dumps({
+        "workers":   {"web": args.web, "bot": args.bot},
+        "ops":       total_ops,
+        "seconds":   round(elapsed, 3),
+        "ops_per_s": round(total_ops / elapsed),
+        "keys":      len(expected),
+        "lost_updates": problems,
+    }, indent=2, ensure_ascii=False))
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import os, json, asyncio, logging, threading
+from collections import deque
+
+from aiohttp import web
+
+from metrics import Counter, Gauge
+
+log = logging.getLogger(__name__)
+
+# =========================
+# FEED DE REVOGAÇÃO (Server-Sent Events)
+# Empurra create/delete/expire para os loaders em vez de eles fazerem
+# polling em /keys. Roda em aiohttp (já vem com o discord.py) no loop do
+# bot: cada cliente parado custa só um socket aberto, não uma thread.
+#
+# Opt-in: o feed escuta numa porta própria (FEED_PORT), separada da do
+# Flask ($PORT). Só ligue onde essa porta é exposta; em hosts de porta
+# única (Railway roteia só $PORT) o loader fica no polling de /keys.
+#
+# O id de cada evento é a versão do store, a mesma de /keys: o loader
+# baixa /keys uma vez e conecta com Last-Event-ID (ou ?since=) = version.
+# Se o id pedido já saiu do buffer, recebe um evento "reset" e refaz o /keys.
+# Um commit com várias keys (lote, ou save de outra réplica no Redis) vira
+# vários eventos e só o último leva o id: cair no meio refaz o commit inteiro.
+# =========================
+FEED_PORT      = int(os.environ.get("FEED_PORT", 0))            # porta pública do feed (0 = desligado)
+FEED_BUFFER    = int(os.environ.get("FEED_BUFFER", 10000))      # eventos guardados para retomada
+FEED_HEARTBEAT = float(os.environ.get("FEED_HEARTBEAT", 15))    # segundos entre comentários keep-alive
+FEED_QUEUE     = int(os.environ.get("FEED_QUEUE", 1000))        # eventos pendentes antes de derrubar um cliente lento
+
+EVENTS = {"add": "create", "del": "delete", "exp": "expire"}    # "upd" (toggle de used) não interessa ao loader
+
+FEED_EVENTS  = Counter("keys_feed_events_total", "Eventos publicados no feed", ("event",))
+FEED_DROPPED = Counter("keys_feed_dropped_total", "Clientes derrubados por não acompanhar o feed")
+
+
+def sse(seq: int | None, event: str, data: dict) -> bytes:
+    head = "" if seq is None else f"id: {seq}\n"
+    return f"{head}event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+class RevocationFeed:
+    def __init__(self, store, buffer: int = FEED_BUFFER):
+        self.store    = store
+        self._events  = deque(maxlen=buffer)    # (seq, frames sse do commit já serializados)
+        self._floor   = None                    # ids abaixo disso não dá para retomar (definido no start)
+        self._lock    = threading.Lock()
+        self._clients = set()                   # asyncio.Queue por conexão
+        self._loop    = None
+        self._runner  = None
+        Gauge("keys_feed_clients", "Conexões abertas no feed", fn=lambda: {(): len(self._clients)})
+
+    async def start(self, port: int = FEED_PORT):
+        self._loop = asyncio.get_running_loop()
+        # piso = versão do registro (atômico no store): o que veio antes não está no buffer
+        floor = self.store.follow(self._on_commit)
+        with self._lock:
+            self._floor = floor if self._floor is None else max(floor, self._floor)
+        app = web.Application()
+        app.router.add_get("/keys/events", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "0.0.0.0", port).start()
+        log.info(f"Feed de revogação em :{port}/keys/events")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    # ── publicação ────────────────────────────────────────────────────────────
+    def _on_commit(self, version, entries):
+        # roda com o lock do store, na thread do commit: só serializa e agenda
+        if entries is None:             # store recarregado: o buffer não vale mais
+            with self._lock:
+                self._events.clear()
+                self._floor = version
+            self._loop.call_soon_threadsafe(self._drop_all)
+            return
+        events = [(EVENTS[op], key, rec) for op, key, rec in entries if op in EVENTS]
+        if not events:
+            return
+        frames = []
+        for i, (event, key, rec) in enumerate(events):
+            data = {"key": key}
+            if event == "create":
+                data["expires"] = rec.expires
+            frames.append(sse(version if i == len(events) - 1 else None, event, data))
+            FEED_EVENTS.inc(event)
+        frame = b"".join(frames)
+        with self._lock:
+            if len(self._events) == self._events.maxlen:
+                self._floor = self._events[0][0]
+            self._events.append((version, frame))
+        self._loop.call_soon_threadsafe(self._fanout, version, frame)
+
+    def _drop_all(self):
+        # reconectam com Last-Event-ID abaixo do piso e recebem "reset"
+        for q in list(self._clients):
+            self._clients.discard(q)
+            q.put_nowait(None)
+
+    def _fanout(self, seq: int, frame: bytes):
+        for q in list(self._clients):
+            if q.qsize() >= FEED_QUEUE:
+                # cliente lento: derruba; ele reconecta com Last-Event-ID
+                self._clients.discard(q)
+                q.put_nowait(None)
+                FEED_DROPPED.inc()
+            else:
+                q.put_nowait((seq, frame))
+
+    def replay(self, since: int) -> list[tuple[int, bytes]] | None:
+        """Eventos depois de `since`, ou None se parte deles não está no buffer.
+
+        Também None para ids à frente da versão atual (de outra réplica ou
+        de antes de um restart): o cliente recebe "reset" e refaz o /keys.
+        """
+        with self._lock:
+            if self._floor is None or since < self._floor or since > self.store.version:
+                return None
+            return [e for e in self._events if e[0] > since]
+
+    # ── conexão ───────────────────────────────────────────────────────────────
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        since = request.headers.get("Last-Event-ID") or request.query.get("since")
+        try:
+            since = int(since) if since else None
+        except ValueError:
+            raise web.HTTPBadRequest(text="since inválido")
+
+        resp = web.StreamResponse(headers={
+            "Content-Type":      "text/event-stream",
+            "Cache-Control":     "no-cache",
+            "X-Accel-Buffering": "no",          # proxies não devem segurar o stream
+        })
+        await resp.prepare(request)
+
+        q = asyncio.Queue()
+        self._clients.add(q)                    # registra antes do replay: nada cai no intervalo
+        try:
+            backlog = self.replay(since) if since is not None else None
+            if backlog is None:
+                last = self.store.version
+                await resp.write(sse(last, "reset", {"version": last}))
+            else:
+                last = since
+                for seq, frame in backlog:
+                    await resp.write(frame)
+                    last = seq
+            while True:
+                try:
+                    item = await asyncio.wait_for(q.get(), FEED_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    await resp.write(b": ping\n\n")
+                    continue
+                if item is None:
+                    break
+                seq, frame = item
+                if seq > last:                  # já enviado no replay
+                    await resp.write(frame)
+                    last = seq
+        except ConnectionResetError:
+            pass
+        finally:
+            self._clients.discard(q)
+        return resp
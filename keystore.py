@@ -0,0 +1,481 @@
+import os, threading, logging, time, heapq, itertools, secrets
+from collections import deque
+from datetime import datetime, timezone
+from typing import NamedTuple
+from storage import open_backend
+from metrics import Counter, Histogram
+
+log = logging.getLogger(__name__)
+
+# =========================
+# KEY STORE (memória + write-behind)
+# Carrega o backend uma vez, serve leituras da memória e grava as
+# mutações em lote, com debounce (ver storage.py).
+# =========================
+FLUSH_DELAY = float(os.environ.get("FLUSH_DELAY", 0.5))     # segundos agrupando mutações antes de gravar
+CHANGELOG_SIZE = int(os.environ.get("CHANGELOG_SIZE", 10000))  # mutações guardadas para o delta de /keys
+BUCKET_SECONDS = 3600                                            # resolução do histograma de expiração
+
+STORAGE_LOAD_SECONDS = Histogram("keystore_load_seconds", "Duração do load inicial do backend", ("backend",),
+                                 buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30))
+STORAGE_SAVE_SECONDS = Histogram("keystore_save_seconds", "Duração de cada flush no backend", ("backend",))
+STORAGE_SAVED_KEYS   = Counter("keystore_saved_changes_total", "Keys gravadas/removidas no backend", ("backend",))
+KEYS_EXPIRED         = Counter("keys_expired_total", "Keys removidas por expiração")
+
+
+def to_epoch(iso: str) -> float:
+    """ISO-8601 → epoch. Datas sem fuso são UTC (geradas com utcnow)."""
+    dt = datetime.fromisoformat(iso)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def to_iso(epoch: int) -> str:
+    """epoch → ISO-8601 sem fuso (UTC), o formato gravado pelos backends."""
+    return datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+class KeyRecord(NamedTuple):
+    """Registro compacto de uma key: epochs inteiros em vez de strings ISO.
+
+    Imutável (tupla): mutações trocam o registro inteiro via _replace.
+    Os backends continuam falando dicts; a conversão acontece só no load/flush.
+    """
+    expires:    int
+    created_at: int | None = None
+    created_by: int | str | None = None
+    used:       bool = False
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "KeyRecord":
+        created = d.get("created_at")
+        return cls(int(to_epoch(d["expires"])), int(to_epoch(created)) if created else None,
+                   d.get("created_by"), bool(d.get("used")))
+
+    def to_dict(self) -> dict:
+        d = {"expires": to_iso(self.expires)}
+        if self.created_by is not None: d["created_by"] = self.created_by
+        if self.created_at is not None: d["created_at"] = to_iso(self.created_at)
+        if self.used:                   d["used"] = True
+        return d
+
+    @property
+    def expires_date(self) -> str:
+        return time.strftime("%Y-%m-%d", time.gmtime(self.expires))
+
+    @property
+    def created_date(self) -> str:
+        return time.strftime("%Y-%m-%d", time.gmtime(self.created_at)) if self.created_at is not None else "—"
+
+
+def _merge_op(prev: str | None, op: str) -> str:
+    """Op acumulada de uma key entre dois saves: add seguido de upd continua add."""
+    return "add" if op == "upd" and prev == "add" else op
+
+
+def _notify(fns, *args):
+    for fn in fns:
+        try:
+            fn(*args)
+        except Exception:   # ex.: call_soon_threadsafe com o loop do bot já fechado
+            log.exception(f"Listener {fn!r} falhou")
+
+
+class KeyStore:
+    """Dicionário de keys compartilhado entre a thread do Flask e o loop do bot.
+
+    Os registros (KeyRecord) são imutáveis: toda mutação troca o valor
+    inteiro, então snapshots e get() podem ser lidos sem lock.
+
+    A expiração fica num min-heap de (epoch, key) com remoção preguiçosa:
+    entradas cuja key sumiu ou mudou de validade são descartadas no pop.
+
+    `version` cresce a cada mutação a partir de um id aleatório do processo
+    nos bits altos (id << 32, abaixo de 2**53 para clientes JS). Versões de
+    um boot anterior caem fora de [floor, version] e recebem a lista
+    completa / "reset". As últimas mutações ficam num changelog circular
+    para responder deltas.
+
+    Com backend compartilhado, `version` é a sequência de commits do backend
+    (a mesma em todas as réplicas) e o changelog é montado com as mensagens
+    de commit, na ordem: qualquer réplica responde ao ETag/since de outra.
+    Mutações locais aparecem na memória na hora, mas só entram no changelog
+    quando o próprio commit volta.
+
+    Contadores (usadas) e um histograma de expirações por hora são mantidos
+    a cada mutação, então stats() não percorre as keys.
+    """
+
+    def __init__(self, backend=None, flush_delay: float = FLUSH_DELAY):
+        self.backend     = backend if backend is not None else open_backend()
+        self.flush_delay = flush_delay
+        self._lock   = threading.RLock()
+        self._io     = threading.Lock()       # serializa writes (flusher x close)
+        start = time.perf_counter()
+        self._keys   = {k: KeyRecord.from_dict(v) for k, v in self.backend.load().items()}
+        STORAGE_LOAD_SECONDS.observe(time.perf_counter() - start, self.backend.name)
+        self._heap   = [(r.expires, k) for k, r in self._keys.items()]
+        heapq.heapify(self._heap)
+        self._used    = 0
+        self._buckets = {}                    # hora (epoch // BUCKET_SECONDS) -> nº de keys expirando nela
+        for r in self._keys.values():
+            self._account(None, r)
+        if self.backend.shared:
+            self.version = self.backend.version     # último commit visto pelo load
+        else:
+            self.version = secrets.randbelow(2 ** 21) << 32
+        self._floor  = self.version               # deltas anteriores a isso exigem lista completa
+        self._log    = deque(maxlen=CHANGELOG_SIZE)   # (version, "add" | "del" | "exp", key)
+        self._listeners = []
+        self._followers = []
+        self._dirty  = {}                     # key -> registro (None = removida) desde o último save
+        self._ops    = {}                     # key -> última op desde o save (vai para as réplicas junto)
+        self._inflight = {}                   # key -> saves ainda não confirmados pelo backend compartilhado
+        self._wake   = threading.Event()
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, name="keystore-flush", daemon=True)
+        self._flusher.start()
+        if self.backend.shared:
+            self.backend.watch(self.apply_remote)
+        log.info(f"KeyStore carregado: {len(self._keys)} keys de {self.backend}")
+
+    # ── persistência ──────────────────────────────────────────────────────────
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait()
+            if self._closed:
+                return
+            time.sleep(self.flush_delay)   # junta as mutações da janela num único write
+            try:
+                self.flush()
+            except Exception:
+                log.exception("Falha ao gravar o KeyStore")
+
+    def _mark_dirty(self, key: str, op: str):
+        self._dirty[key] = self._keys.get(key)
+        self._ops[key]   = _merge_op(self._ops.get(key), op)
+        self._wake.set()
+
+    def _record(self, op: str, key: str, dirty: bool = True):
+        # sujo antes dos listeners: nada que eles façam impede a mutação de ser gravada
+        if dirty:
+            self._mark_dirty(key, op)
+        if not self.backend.shared:     # compartilhado: versão e changelog vêm do commit
+            self.version += 1
+            if op != "upd":     # "upd" só avança a versão: não muda a lista de keys
+                self._commit(self.version, [(op, key, self._keys.get(key))])
+        _notify(self._listeners, self.version, op, key)
+
+    def _commit(self, version: int, entries: list):
+        """Põe as entradas (op, key, registro) de um commit no changelog e avisa os followers."""
+        for op, key, _ in entries:
+            if len(self._log) == self._log.maxlen:
+                self._floor = self._log[0][0]
+            self._log.append((version, op, key))
+        if entries:
+            _notify(self._followers, version, entries)
+
+    def subscribe(self, fn) -> int:
+        """Registra fn(version, op, key), chamada a cada mutação ("add" | "upd" | "del" | "exp").
+
+        Roda com o lock do store, na thread que fez a mutação: tem que ser rápida
+        e, se precisar do loop asyncio, usar call_soon_threadsafe. Exceções são
+        logadas e não desfazem nem interrompem a mutação. Retorna a
+        versão no momento do registro: fn recebe tudo o que vier depois dela.
+        """
+        with self._lock:
+            self._listeners.append(fn)
+            return self.version
+
+    def follow(self, fn) -> int:
+        """Registra fn(version, entries) para cada commit, na ordem do changelog.
+
+        entries = [(op, key, registro)] sem "upd"; num backend compartilhado
+        um commit (save de qualquer réplica) pode trazer várias. fn(version, None)
+        avisa que o histórico foi descartado (recarga): recomeçar de `version`.
+        Mesmas regras de subscribe(); retorna a versão no momento do registro.
+        """
+        with self._lock:
+            self._followers.append(fn)
+            return self.version
+
+    def flush(self):
+        """Grava imediatamente se houver mutações pendentes."""
+        with self._io:
+            with self._lock:
+                if not self._dirty:
+                    self._wake.clear()
+                    return
+                snapshot = None if self.backend.incremental else dict(self._keys)
+                changes, self._dirty = self._dirty, {}
+                ops, self._ops = self._ops, {}
+                if self.backend.shared:   # protegidas do apply_remote até a própria mensagem voltar
+                    for k in changes:
+                        self._inflight[k] = self._inflight.get(k, 0) + 1
+                self._wake.clear()
+            start = time.perf_counter()
+            try:
+                # fronteira com o backend: KeyRecord -> dict
+                if snapshot is not None:
+                    snapshot = {k: r.to_dict() for k, r in snapshot.items()}
+                payload = {k: r and r.to_dict() for k, r in changes.items()}
+                if self.backend.shared:
+                    self.backend.save(snapshot, payload, ops)
+                else:
+                    self.backend.save(snapshot, payload)
+                STORAGE_SAVE_SECONDS.observe(time.perf_counter() - start, self.backend.name)
+                STORAGE_SAVED_KEYS.inc(self.backend.name, value=len(changes))
+            except Exception:
+                with self._lock:     # devolve as mudanças para a próxima tentativa
+                    for k, rec in changes.items():
+                        self._dirty.setdefault(k, rec)
+                    for k, op in ops.items():
+                        self._ops[k] = op if k not in self._ops else _merge_op(op, self._ops[k])
+                    self._settle(changes)
+                raise
+
+    def _settle(self, keys):
+        for k in keys:
+            n = self._inflight.pop(k, 0) - 1
+            if n > 0:
+                self._inflight[k] = n
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self.flush()
+        self.backend.close()
+
+    # ── leitura ───────────────────────────────────────────────────────────────
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def get(self, key: str) -> KeyRecord | None:
+        return self._keys.get(key)
+
+    def _live(self, exp: int, key: str) -> bool:
+        rec = self._keys.get(key)
+        return rec is not None and rec.expires == exp
+
+    def next_expiry(self) -> int | None:
+        """Epoch da próxima key a expirar (ou None se o store está vazio)."""
+        with self._lock:
+            while self._heap and not self._live(*self._heap[0]):
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def snapshot(self) -> dict[str, KeyRecord]:
+        with self._lock:
+            return dict(self._keys)
+
+    def items(self) -> list[tuple[str, KeyRecord]]:
+        with self._lock:
+            return list(self._keys.items())
+
+    def head(self, n: int) -> list[tuple[str, KeyRecord]]:
+        """As primeiras `n` keys (ordem de inserção) sem copiar o store inteiro."""
+        with self._lock:
+            return list(itertools.islice(self._keys.items(), n))
+
+    def keys_with_version(self) -> tuple[list[str], int]:
+        with self._lock:
+            return list(self._keys), self.version
+
+    def changes_since(self, version: int) -> tuple[list[str], list[str], int] | None:
+        """(adicionadas, removidas, versão atual) desde `version`.
+
+        Retorna None quando `version` já saiu do changelog (ou é de outro
+        processo) e o cliente precisa recarregar a lista completa.
+        """
+        with self._lock:
+            if version < self._floor or version > self.version:
+                return None
+            last = {}
+            for v, op, key in reversed(self._log):
+                if v <= version:
+                    break
+                last.setdefault(key, op)
+            added   = [k for k, op in last.items() if op == "add" and k in self._keys]
+            removed = [k for k, op in last.items() if op != "add" or k not in self._keys]
+            return added, removed, self.version
+
+    def stats(self, soon_seconds: float = 3 * 86400, now: float | None = None) -> dict:
+        """total/used/available e quantas expiram em até `soon_seconds` (resolução de 1h), em O(janela)."""
+        now = time.time() if now is None else now
+        with self._lock:
+            total, used = len(self._keys), self._used
+            first = int(now // BUCKET_SECONDS)
+            last  = int((now + soon_seconds) // BUCKET_SECONDS)
+            soon  = sum(self._buckets.get(b, 0) for b in range(first, last + 1))
+        return {"total": total, "used": used, "available": total - used, "expiring_soon": soon}
+
+    # ── mutações ──────────────────────────────────────────────────────────────
+    def _account(self, old: KeyRecord | None, new: KeyRecord | None):
+        """Atualiza contadores e histograma para a troca old -> new de um registro."""
+        if old is not None:
+            self._used -= old.used
+            b = old.expires // BUCKET_SECONDS
+            if self._buckets[b] == 1:
+                del self._buckets[b]
+            else:
+                self._buckets[b] -= 1
+        if new is not None:
+            self._used += new.used
+            b = new.expires // BUCKET_SECONDS
+            self._buckets[b] = self._buckets.get(b, 0) + 1
+
+    def _forget(self, key: str, op: str = "del", dirty: bool = True) -> bool:
+        rec = self._keys.pop(key, None)
+        if rec is None:
+            return False
+        self._account(rec, None)
+        self._record(op, key, dirty)
+        return True
+
+    def _maybe_compact_heap(self):
+        # deletes manuais deixam lixo no heap; reconstrói quando passa de 2x
+        if len(self._heap) > 2 * len(self._keys) + 64:
+            self._heap = [(r.expires, k) for k, r in self._keys.items()]
+            heapq.heapify(self._heap)
+
+    def _set(self, key: str, rec: KeyRecord, dirty: bool = True):
+        old = self._keys.get(key)
+        self._keys[key] = rec
+        self._account(old, rec)
+        if old is None or old.expires != rec.expires:
+            heapq.heappush(self._heap, (rec.expires, key))
+        self._record("add" if old is None else "upd", key, dirty)
+
+    def put(self, key: str, rec: KeyRecord):
+        with self._lock:
+            self._set(key, rec)
+
+    def apply_remote(self, changes: dict | None, own: bool = False,
+                     version: int | None = None, ops: dict | None = None):
+        """Aplica um commit do backend compartilhado (sem regravar) e o põe no changelog.
+
+        `changes` vem no formato do backend (key -> dict | None), na ordem dos
+        commits, com a `version` do commit e as `ops` de quem gravou; None
+        significa que mensagens se perderam e o estado inteiro é recarregado e
+        comparado. `own` marca a volta de um save deste processo (já na memória).
+
+        Keys com mutação local pendente ou em gravação ficam com a versão local:
+        o que chega antes da nossa própria mensagem foi commitado antes do nosso
+        save e será sobrescrito por ele; o que chega depois é aplicado normalmente.
+        """
+        if changes is None:
+            self._reload()
+            return
+        with self._lock:
+            if own:
+                self._settle(changes)
+            else:
+                self._apply(changes)
+            if version is not None:
+                self.version = version
+                ops = ops or {}
+                self._commit(version, [
+                    (op, key, data and KeyRecord.from_dict(data))
+                    for key, data in changes.items()
+                    for op in (ops.get(key) or ("add" if data is not None else "del"),)
+                    if op != "upd"])
+
+    def _apply(self, changes: dict):
+        for key, data in changes.items():
+            if key in self._dirty or key in self._inflight:
+                continue
+            if data is None:
+                self._forget(key, dirty=False)
+            else:
+                self._set(key, KeyRecord.from_dict(data), dirty=False)
+        self._maybe_compact_heap()
+
+    def _reload(self):
+        loaded = self.backend.load()
+        with self._lock:
+            changes = {k: None for k in self._keys if k not in loaded}
+            changes.update((k, v) for k, v in loaded.items() if self._keys.get(k) != KeyRecord.from_dict(v))
+            changes = {k: v for k, v in changes.items() if k not in self._inflight}
+            self._inflight.clear()    # a mensagem própria pode ter sido a perdida
+            self._apply(changes)
+            # o buraco no histórico não tem ops: deltas e feed recomeçam do commit carregado
+            self.version = self._floor = self.backend.version
+            self._log.clear()
+            _notify(self._followers, self.version, None)
+        log.info(f"KeyStore recarregado do backend: {len(changes)} diferenças")
+
+    def add_many(self, records: dict[str, KeyRecord]) -> list[str]:
+        """Insere várias keys num único lote; ignora as que já existem.
+
+        Retorna as keys efetivamente inseridas (as demais colidiram).
+        """
+        added = []
+        with self._lock:
+            for key, rec in records.items():
+                if key in self._keys:
+                    continue
+                self._keys[key] = rec
+                self._account(None, rec)
+                heapq.heappush(self._heap, (rec.expires, key))
+                self._record("add", key)
+                added.append(key)
+        return added
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            if not self._forget(key):
+                return False
+            self._maybe_compact_heap()
+            return True
+
+    def delete_many(self, keys) -> int:
+        with self._lock:
+            removed = sum(1 for k in keys if self._forget(k))
+            if removed:
+                self._maybe_compact_heap()
+            return removed
+
+    def purge_expired(self, now: float | None = None, limit: int | None = None) -> list[str]:
+        """Remove até `limit` keys vencidas em O(expiradas·log n).
+
+        Só marca o store como sujo (e portanto só gera write) se algo expirou.
+        """
+        now = time.time() if now is None else now
+        expired = []
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] <= now and (limit is None or len(expired) < limit):
+                exp, key = heapq.heappop(heap)
+                if self._live(exp, key):
+                    self._forget(key, "exp")
+                    expired.append(key)
+        if expired:
+            KEYS_EXPIRED.inc(value=len(expired))
+        return expired
+
+    def update(self, key: str, fn) -> KeyRecord | None:
+        """Read-modify-write atômico: grava fn(registro atual) e retorna o novo registro.
+
+        Retorna None (sem chamar fn) se a key não existe.
+        """
+        with self._lock:
+            rec = self._keys.get(key)
+            if rec is None:
+                return None
+            new = fn(rec)
+            self.put(key, new)
+            return self._keys[key]
+
+    def toggle_used(self, key: str) -> bool | None:
+        """Inverte o campo "used"; retorna o novo valor ou None se a key não existe."""
+        rec = self.update(key, lambda r: r._replace(used=not r.used))
+        return None if rec is None else rec.used
+
+    def set_used(self, key: str, used: bool) -> bool:
+        """Define "used" (idempotente, ao contrário do toggle); False se a key não existe."""
+        return self.update(key, lambda r: r._replace(used=used)) is not None
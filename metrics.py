@@ -0,0 +1,137 @@
+import time, threading, functools, inspect
+
+# =========================
+# MÉTRICAS (formato texto do Prometheus)
+# Implementação mínima sem dependências: Counter, Gauge e Histogram com
+# labels, um registry global e o decorator timed() para handlers.
+# =========================
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for m in self._metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), registry: Registry = REGISTRY):
+        self.name, self.help, self.labels = name, help, labels
+        self._values = {}
+        self._lock   = threading.Lock()
+        registry.register(self)
+
+    def inc(self, *labels, value: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(self.labels, k)} {v}" for k, v in items]
+
+
+class Gauge:
+    """Valor setado diretamente ou lido de uma função na hora do scrape."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), fn=None, registry: Registry = REGISTRY):
+        self.name, self.help, self.labels = name, help, labels
+        self._values = {}
+        self._fn     = fn       # fn() -> {labels: valor}
+        registry.register(self)
+
+    def set(self, *labels, value: float):
+        self._values[labels] = value
+
+    def samples(self):
+        values = self._fn() if self._fn is not None else dict(self._values)
+        return [f"{self.name}{_labels(self.labels, k)} {v}" for k, v in values.items()]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS,
+                 registry: Registry = REGISTRY):
+        self.name, self.help, self.labels = name, help, labels
+        self.buckets = buckets
+        self._series = {}        # labels -> [contagem por bucket..., soma, total]
+        self._lock   = threading.Lock()
+        registry.register(self)
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    s[i] += 1
+                    break
+            s[-2] += value
+            s[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            series = [(k, list(v)) for k, v in self._series.items()]
+        out = []
+        for labels, s in series:
+            acc = 0
+            for bound, n in zip(self.buckets, s):
+                acc += n
+                le = 'le="%s"' % bound
+                out.append(f"{self.name}_bucket{_labels(self.labels, labels, le)} {acc}")
+            le = 'le="+Inf"'
+            out.append(f"{self.name}_bucket{_labels(self.labels, labels, le)} {s[-1]}")
+            out.append(f"{self.name}_sum{_labels(self.labels, labels)} {s[-2]}")
+            out.append(f"{self.name}_count{_labels(self.labels, labels)} {s[-1]}")
+        return out
+
+
+def timed(histogram: Histogram, *labels):
+    """Mede a duração da função (sync ou async) em `histogram` com os labels dados."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start, *labels)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, *labels)
+        return wrapper
+    return decorator
@@ -0,0 +1,67 @@
+let pendingDeleteKey = null;
+
+// Clock
+function tick(){
+  const n=new Date();
+  document.getElementById('clock').textContent=n.toLocaleTimeString('pt-BR');
+}
+setInterval(tick,1000); tick();
+
+// Copy
+function copyKey(k){
+  navigator.clipboard.writeText(k);
+  const t=document.getElementById('toast');
+  t.classList.add('show');
+  setTimeout(()=>t.classList.remove('show'),2000);
+}
+
+// Toggle used
+function toggleUsed(key, btn, idx, isUsed){
+  const row=document.querySelector('[data-key="'+key+'"]');
+  // envia o estado desejado (não um toggle cego) com base no que está na tela
+  const target=row.dataset.used!=='true';
+  fetch('/admin/api/toggle-used',{
+    method:'POST',
+    headers:{'Content-Type':'application/json'},
+    body:JSON.stringify({key,used:target})
+  }).then(r=>r.json()).then(d=>{
+    if(d.ok){
+      const newUsed=d.used;
+      row.dataset.used=newUsed?'true':'false';
+      row.classList.toggle('row-used',newUsed);
+      document.getElementById('badge-'+idx).innerHTML=newUsed
+        ?'<span class="badge b-used">⬡ Utilizada</span>'
+        :'<span class="badge b-active">● Ativa</span>';
+      btn.textContent=newUsed?'↩':'✓';
+      btn.querySelector('.tooltip').textContent=newUsed?'Desmarcar':'Marcar como Usada';
+    }
+  });
+}
+
+// Delete modal
+function confirmDelete(key){
+  pendingDeleteKey=key;
+  document.getElementById('del-key-display').textContent=key;
+  document.getElementById('del-modal').classList.add('open');
+}
+function closeModal(){
+  document.getElementById('del-modal').classList.remove('open');
+  pendingDeleteKey=null;
+}
+function deleteKey(){
+  if(!pendingDeleteKey)return;
+  fetch('/admin/api/delete-key',{
+    method:'POST',
+    headers:{'Content-Type':'application/json'},
+    body:JSON.stringify({key:pendingDeleteKey})
+  }).then(r=>r.json()).then(d=>{
+    if(d.ok){
+      document.querySelector('[data-key="'+pendingDeleteKey+'"]').remove();
+    }
+    closeModal();
+  });
+}
+// Close modal on overlay click
+document.getElementById('del-modal').addEventListener('click',function(e){
+  if(e.target===this)closeModal();
+});
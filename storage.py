@@ -0,0 +1,415 @@
+import json, os, sqlite3, logging, argparse, threading, time, uuid
+from datetime import datetime, timezone
+
+log = logging.getLogger(__name__)
+
+# =========================
+# BACKENDS DE PERSISTÊNCIA
+# Todos expõem load() -> dict e save(keys, changes), onde `changes` mapeia
+# key -> registro (None = removida) desde o último save. Backends
+# incrementais ignoram `keys` e aplicam só as mudanças; backends
+# compartilhados (shared) recebem também as ops de cada key (add/upd/del/exp),
+# avisam via watch() o que outros processos gravaram e expõem `version`, a
+# sequência de commits comum a todos os processos.
+# =========================
+STORAGE      = os.environ.get("STORAGE", "json").lower()            # json | sqlite | journal | redis
+DB_FILE      = os.environ.get("DB_FILE", "/tmp/keys.json")          # /tmp sobrevive ao processo mas não ao redeploy
+SQLITE_FILE  = os.environ.get("SQLITE_FILE", "/tmp/keys.db")
+JOURNAL_MAX  = int(os.environ.get("JOURNAL_MAX", 4 * 1024 * 1024))  # bytes do log antes de compactar
+REDIS_URL    = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+REDIS_PREFIX = os.environ.get("REDIS_PREFIX", "keys")               # namespace das estruturas no Redis
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class JsonBackend:
+    """Arquivo JSON único, regravado inteiro via tmp + rename atômico."""
+
+    name        = "json"
+    incremental = False
+    shared      = False
+
+    def __init__(self, path: str = DB_FILE):
+        self.path = path
+
+    def __str__(self):
+        return f"json:{self.path}"
+
+    def size(self) -> int:
+        """Bytes ocupados em disco."""
+        return _file_size(self.path)
+
+    def load(self) -> dict:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save(self, keys: dict, changes: dict):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(keys, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def close(self):
+        pass
+
+
+class SqliteBackend:
+    """SQLite em modo WAL; cada save grava só as linhas alteradas numa transação."""
+
+    name        = "sqlite"
+    incremental = True
+    shared      = False
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS keys (
+            key        TEXT PRIMARY KEY,
+            expires    TEXT NOT NULL,
+            created_by INTEGER,
+            created_at TEXT,
+            used       INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS keys_expires ON keys(expires);
+    """
+    # SQL constante: o sqlite3 mantém os statements preparados em cache
+    UPSERT = """
+        INSERT INTO keys (key, expires, created_by, created_at, used) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(key) DO UPDATE SET expires=excluded.expires, created_by=excluded.created_by,
+                                       created_at=excluded.created_at, used=excluded.used
+    """
+    DELETE = "DELETE FROM keys WHERE key = ?"
+
+    def __init__(self, path: str = SQLITE_FILE):
+        self.path = path
+        # o save roda na thread do flusher; o KeyStore já serializa os acessos
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def __str__(self):
+        return f"sqlite:{self.path}"
+
+    def size(self) -> int:
+        return _file_size(self.path) + _file_size(f"{self.path}-wal")
+
+    @staticmethod
+    def _row(key: str, rec: dict) -> tuple:
+        return (key, rec["expires"], rec.get("created_by"), rec.get("created_at"), int(bool(rec.get("used"))))
+
+    def load(self) -> dict:
+        keys = {}
+        for key, expires, created_by, created_at, used in self.conn.execute(
+                "SELECT key, expires, created_by, created_at, used FROM keys"):
+            rec = {"expires": expires}
+            if created_by is not None: rec["created_by"] = created_by
+            if created_at is not None: rec["created_at"] = created_at
+            if used:                   rec["used"] = True
+            keys[key] = rec
+        return keys
+
+    def save(self, keys: dict | None, changes: dict):
+        upserts = [self._row(k, rec) for k, rec in changes.items() if rec is not None]
+        deletes = [(k,) for k, rec in changes.items() if rec is None]
+        with self.conn:
+            self.conn.execute("BEGIN")
+            if upserts: self.conn.executemany(self.UPSERT, upserts)
+            if deletes: self.conn.executemany(self.DELETE, deletes)
+
+    def close(self):
+        self.conn.close()
+
+
+class JournalBackend:
+    """Snapshot JSON + log append-only de mutações (uma linha JSON por registro).
+
+    Cada save acrescenta as linhas do lote e faz um único fsync. Quando o log
+    passa de `max_bytes`, ele é rotacionado para `.old` e uma thread recria o
+    snapshot (snapshot + .old) em segundo plano. Replays são idempotentes,
+    então um crash no meio da compactação só repete trabalho no boot.
+
+    Um crash no meio de um write deixa a última linha cortada: ela é truncada
+    na abertura, antes de qualquer append, para não grudar no próximo registro.
+    """
+
+    name        = "journal"
+    incremental = True
+    shared      = False
+
+    def __init__(self, path: str = DB_FILE, max_bytes: int = JOURNAL_MAX):
+        self.snapshot_path = path
+        self.path          = f"{path}.log"
+        self.old_path      = f"{path}.log.old"
+        self.max_bytes     = max_bytes
+        self._compactor    = None
+        self._truncate_torn_tail(self.path)
+        self._file         = open(self.path, "a")
+        if os.path.exists(self.old_path):   # compactação interrompida: termina antes de rotacionar de novo
+            self._compact()
+
+    def __str__(self):
+        return f"journal:{self.path}"
+
+    def size(self) -> int:
+        return sum(map(_file_size, (self.snapshot_path, self.path, self.old_path)))
+
+    @staticmethod
+    def _truncate_torn_tail(path: str):
+        """Corta o log depois do último \n (linha de um write interrompido)."""
+        try:
+            f = open(path, "rb+")
+        except FileNotFoundError:
+            return
+        with f:
+            size = end = f.seek(0, os.SEEK_END)
+            while end > 0:
+                start = max(0, end - 4096)
+                f.seek(start)
+                i = f.read(end - start).rfind(b"\n")
+                if i >= 0:
+                    end = start + i + 1
+                    break
+                end = start
+            if end < size:
+                f.truncate(end)
+                f.flush()
+                os.fsync(f.fileno())
+                log.warning(f"Journal: {size - end} bytes de uma linha incompleta descartados em {path}")
+
+    @staticmethod
+    def _replay(path: str, keys: dict) -> int:
+        n = 0
+        try:
+            with open(path, "r") as f:
+                for lineno, line in enumerate(f, 1):
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        log.warning(f"Journal: linha {lineno} inválida em {path}, ignorada")
+                        continue
+                    if entry["op"] == "put":
+                        keys[entry["key"]] = entry["rec"]
+                    else:
+                        keys.pop(entry["key"], None)
+                    n += 1
+        except FileNotFoundError:
+            pass
+        return n
+
+    def load(self) -> dict:
+        keys = JsonBackend(self.snapshot_path).load()
+        n = self._replay(self.old_path, keys) + self._replay(self.path, keys)
+        if n:
+            log.info(f"Journal: {n} mutações reaplicadas sobre o snapshot")
+        return keys
+
+    def save(self, keys: dict | None, changes: dict):
+        lines = [json.dumps({"op": "put", "key": k, "rec": rec} if rec is not None else
+                            {"op": "del", "key": k}, separators=(",", ":"))
+                 for k, rec in changes.items()]
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        if self._file.tell() > self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        if os.path.exists(self.old_path):
+            # compactação anterior falhou: o .old ainda não está no snapshot e não
+            # pode ser sobrescrito; tenta de novo antes de rotacionar
+            self._compactor = threading.Thread(target=self._compact, name="journal-compact", daemon=True)
+            self._compactor.start()
+            return
+        self._file.close()
+        os.replace(self.path, self.old_path)
+        self._file = open(self.path, "a")
+        self._compactor = threading.Thread(target=self._compact, name="journal-compact", daemon=True)
+        self._compactor.start()
+
+    def _compact(self):
+        try:
+            keys = JsonBackend(self.snapshot_path).load()
+            n = self._replay(self.old_path, keys)
+            JsonBackend(self.snapshot_path).save(keys, {})
+            os.remove(self.old_path)
+        except Exception:
+            log.exception("Journal: falha na compactação; .old mantido para a próxima tentativa")
+            return
+        log.info(f"Journal compactado: {n} mutações, snapshot com {len(keys)} keys")
+
+    def close(self):
+        if self._compactor is not None:
+            self._compactor.join()
+        self._file.close()
+
+
+class RedisBackend:
+    """Estado compartilhado entre réplicas web e o bot num Redis.
+
+    - {prefix}:keys     hash key -> registro em JSON compacto
+    - {prefix}:expires  sorted set key -> epoch de expiração
+    - {prefix}:version  contador incrementado a cada save
+    - {prefix}:changes  canal pub/sub com "<version> <payload>" de cada save
+
+    Cada save roda num script Lua (atômico): aplica o lote, incrementa a
+    versão e publica as mudanças (com as ops), então as mensagens chegam na
+    ordem das versões e todo processo monta o mesmo changelog. Quem perde uma mensagem (salto de versão ou reconexão) recebe
+    None no watch() e recarrega tudo.
+    """
+
+    name        = "redis"
+    incremental = True
+    shared      = True
+
+    SAVE = """
+        local n = tonumber(ARGV[3])
+        for i = 0, n - 1 do
+            local j = 4 + i * 3
+            redis.call('HSET', KEYS[1], ARGV[j], ARGV[j + 1])
+            redis.call('ZADD', KEYS[2], ARGV[j + 2], ARGV[j])
+        end
+        for j = 4 + n * 3, #ARGV do
+            redis.call('HDEL', KEYS[1], ARGV[j])
+            redis.call('ZREM', KEYS[2], ARGV[j])
+        end
+        local v = redis.call('INCR', KEYS[3])
+        redis.call('PUBLISH', ARGV[1], v .. ' ' .. ARGV[2])
+        return v
+    """
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = REDIS_PREFIX, client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("STORAGE=redis requer o pacote redis (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self.r        = client
+        self.url      = url
+        self.hash     = f"{prefix}:keys"
+        self.zset     = f"{prefix}:expires"
+        self.counter  = f"{prefix}:version"
+        self.channel  = f"{prefix}:changes"
+        self.origin   = uuid.uuid4().hex       # identifica as mensagens deste processo
+        self._save    = self.r.register_script(self.SAVE)
+        self.version  = 0                      # último commit aplicado (load ou mensagem)
+        self._pubsub  = None
+        self._watcher = None
+
+    def __str__(self):
+        return f"redis:{self.url}/{self.hash}"
+
+    def size(self) -> int:
+        try:
+            return sum(self.r.memory_usage(k) or 0 for k in (self.hash, self.zset))
+        except Exception:
+            return 0    # MEMORY USAGE pode estar desabilitado
+
+    def load(self) -> dict:
+        # versão antes dos dados: o que for gravado no meio volta pelas mensagens (idempotente)
+        self.version = int(self.r.get(self.counter) or 0)
+        return {k.decode(): json.loads(v) for k, v in self.r.hscan_iter(self.hash, count=10000)}
+
+    def save(self, keys: dict | None, changes: dict, ops: dict | None = None):
+        puts = [(k, rec) for k, rec in changes.items() if rec is not None]
+        msg  = {"origin": self.origin, "changes": changes, "ops": ops or {}}
+        args = [self.channel, json.dumps(msg, separators=(",", ":")), len(puts)]
+        for k, rec in puts:
+            args += (k, json.dumps(rec, separators=(",", ":")), _epoch(rec["expires"]))
+        args += [k for k, rec in changes.items() if rec is None]
+        self._save(keys=[self.hash, self.zset, self.counter], args=args)
+
+    def watch(self, fn):
+        """Chama fn(changes, own, version, ops) para cada save, na ordem dos commits.
+
+        `own` é True para os saves deste processo (só confirmam o commit);
+        fn(None) = mensagens perdidas, recarregar tudo (load() avança `version`).
+        """
+        self._pubsub  = self.r.pubsub(ignore_subscribe_messages=False)
+        self._watcher = threading.Thread(target=self._listen, args=(fn,), name="redis-watch", daemon=True)
+        self._watcher.start()
+
+    def _listen(self, fn):
+        while self._pubsub is not None:
+            try:
+                self._pubsub.subscribe(self.channel)
+                for msg in self._pubsub.listen():
+                    if msg["type"] == "subscribe":
+                        if int(self.r.get(self.counter) or 0) != self.version:
+                            fn(None)                # (re)conectou depois de perder mensagens
+                        continue
+                    if msg["type"] != "message":
+                        continue
+                    version, payload = msg["data"].split(b" ", 1)
+                    version = int(version)
+                    if version <= self.version:
+                        continue                    # já coberto pelo load
+                    if version != self.version + 1:
+                        log.warning(f"Redis: versões {self.version + 1}..{version - 1} perdidas, recarregando")
+                        fn(None)
+                        continue
+                    self.version = version
+                    data = json.loads(payload)
+                    fn(data["changes"], data["origin"] == self.origin, version, data.get("ops"))
+            except Exception:
+                if self._pubsub is None:
+                    return
+                log.exception("Redis: assinatura caiu, reconectando")
+                time.sleep(1)
+
+    def close(self):
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            pubsub.close()
+        self.r.close()
+
+
+def _epoch(iso: str) -> float:
+    dt = datetime.fromisoformat(iso)
+    return (dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt).timestamp()
+
+
+def open_backend(kind: str = STORAGE):
+    """Backend escolhido pela env var STORAGE."""
+    if kind == "sqlite":
+        return SqliteBackend(SQLITE_FILE)
+    if kind == "journal":
+        return JournalBackend(DB_FILE)
+    if kind == "json":
+        return JsonBackend(DB_FILE)
+    if kind == "redis":
+        return RedisBackend(REDIS_URL)
+    raise RuntimeError(f"STORAGE inválido: {kind!r} (use json, sqlite, journal ou redis)")
+
+
+def migrate(src, dst) -> int:
+    """Copia todas as keys de um backend para outro; retorna quantas."""
+    keys = src.load()
+    dst.save(dict(keys), dict(keys))
+    return len(keys)
+
+
+# Migração única: python storage.py --json /tmp/keys.json --sqlite /tmp/keys.db
+#            ou:   python storage.py --json /tmp/keys.json --redis redis://host:6379/0
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    parser = argparse.ArgumentParser(description="Migra keys.json para SQLite ou Redis")
+    parser.add_argument("--json",   default=DB_FILE)
+    parser.add_argument("--sqlite", default=SQLITE_FILE)
+    parser.add_argument("--redis",  help="URL do Redis de destino (no lugar do SQLite)")
+    args = parser.parse_args()
+    dst = RedisBackend(args.redis) if args.redis else SqliteBackend(args.sqlite)
+    n   = migrate(JsonBackend(args.json), dst)
+    dst.close()
+    log.info(f"{n} keys migradas de {args.json} para {dst} ✅")
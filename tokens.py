@@ -0,0 +1,150 @@
+import os, hmac, time, base64, struct, hashlib, argparse
+from abc import ABC, abstractmethod
+
+try:                                    # opcional: só o modo ed25519 precisa
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+    from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+except ImportError:
+    Ed25519PrivateKey = Ed25519PublicKey = None
+
+# =========================
+# TOKENS ASSINADOS (validação offline)
+# Token = base64url(payload) "." base64url(assinatura), com payload
+# = formato (1 byte) + expiração em epoch (uint64) + key em ASCII.
+# O cliente confere assinatura e validade sozinho e só volta ao servidor
+# para saber de revogações (/keys, feed SSE).
+#
+# ed25519: o loader só precisa da chave pública (GET /keys/token-key).
+# hmac:    mais rápido, mas quem verifica tem o segredo e pode emitir tokens.
+# =========================
+TOKEN_ALG = os.environ.get("TOKEN_ALG", "ed25519").lower()   # ed25519 | hmac
+TOKEN_KEY = os.environ.get("TOKEN_KEY", "")                  # vazio = tokens desligados (ed25519: seed base64 de 32 bytes)
+
+FORMAT   = 2            # 1 = expiração uint32 (estourava em 2106)
+HEADER   = struct.Struct(">BQ")
+HMAC_LEN = 16           # bytes do HMAC-SHA256 mantidos no token (128 bits)
+
+
+def b64e(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def b64d(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class Verifier(ABC):
+    """Base: confere tokens; subclasses implementam _check."""
+
+    alg = None
+
+    def verify(self, token: str, now: float | None = None) -> tuple[str, str | None, int | None]:
+        """("valid" | "expired" | "invalid", key, epoch de expiração)."""
+        try:
+            head, sig = token.strip().split(".")
+            payload   = b64d(head)
+            fmt, exp  = HEADER.unpack_from(payload)
+            key       = payload[HEADER.size:].decode("ascii")
+            sig       = b64d(sig)
+        except (ValueError, struct.error):      # inclui binascii.Error e UnicodeDecodeError
+            return "invalid", None, None
+        if fmt != FORMAT or not self._check(payload, sig):
+            return "invalid", None, None
+        if exp <= (time.time() if now is None else now):
+            return "expired", key, exp
+        return "valid", key, exp
+
+    @abstractmethod
+    def _check(self, payload: bytes, sig: bytes) -> bool: ...
+
+
+class Signer(Verifier):
+    """Verifier que também emite tokens; subclasses implementam _sign."""
+
+    def sign(self, key: str, expires: int) -> str:
+        payload = HEADER.pack(FORMAT, expires) + key.encode("ascii")
+        return f"{b64e(payload)}.{b64e(self._sign(payload))}"
+
+    @abstractmethod
+    def _sign(self, payload: bytes) -> bytes: ...
+
+
+class Ed25519Verifier(Verifier):
+    """Verificação com a chave pública (base64url de 32 bytes): é o que vai no cliente."""
+
+    alg = "ed25519"
+
+    def __init__(self, public_key: str):
+        if Ed25519PublicKey is None:
+            raise RuntimeError("TOKEN_ALG=ed25519 requer o pacote cryptography (pip install cryptography)")
+        self.public_key = public_key
+        self._pub       = Ed25519PublicKey.from_public_bytes(b64d(public_key))
+
+    def _check(self, payload: bytes, sig: bytes) -> bool:
+        try:
+            self._pub.verify(sig, payload)
+            return True
+        except InvalidSignature:
+            return False
+
+
+class Ed25519Signer(Signer, Ed25519Verifier):
+    def __init__(self, seed: str):
+        if Ed25519PrivateKey is None:
+            raise RuntimeError("TOKEN_ALG=ed25519 requer o pacote cryptography (pip install cryptography)")
+        self._priv = Ed25519PrivateKey.from_private_bytes(b64d(seed))
+        super().__init__(b64e(self._priv.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw)))
+
+    def _sign(self, payload: bytes) -> bytes:
+        return self._priv.sign(payload)
+
+
+class HmacSigner(Signer):
+    alg = "hmac"
+
+    def __init__(self, secret: str):
+        self._secret = secret.encode()
+
+    def _sign(self, payload: bytes) -> bytes:
+        return hmac.new(self._secret, payload, hashlib.sha256).digest()[:HMAC_LEN]
+
+    def _check(self, payload: bytes, sig: bytes) -> bool:
+        return hmac.compare_digest(self._sign(payload), sig)
+
+
+def open_signer(alg: str = TOKEN_ALG, key: str = TOKEN_KEY) -> Signer | None:
+    """Signer configurado pelas env vars TOKEN_ALG/TOKEN_KEY (None se desligado)."""
+    if not key:
+        return None
+    if alg == "hmac":
+        return HmacSigner(key)
+    if alg == "ed25519":
+        return Ed25519Signer(key)
+    raise RuntimeError(f"TOKEN_ALG inválido: {alg!r} (use ed25519 ou hmac)")
+
+
+def new_seed() -> str:
+    return b64e(os.urandom(32))
+
+
+# Gerar chave:      python tokens.py genkey
+# Conferir token:   python tokens.py verify <token> --public-key <chave>
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chaves e verificação de tokens de key")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("genkey", help="gera TOKEN_KEY (ed25519) e mostra a chave pública")
+    check = sub.add_parser("verify", help="confere um token")
+    check.add_argument("token")
+    check.add_argument("--public-key", help="chave pública ed25519 (padrão: derivada de TOKEN_KEY)")
+    args = parser.parse_args()
+
+    if args.cmd == "genkey":
+        seed = new_seed()
+        print(f"TOKEN_KEY={seed}")
+        print(f"chave pública: {Ed25519Signer(seed).public_key}")
+    else:
+        verifier = Ed25519Verifier(args.public_key) if args.public_key else open_signer()
+        if verifier is None:
+            parser.error("informe --public-key ou configure TOKEN_KEY")
+        print(*verifier.verify(args.token))